@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import List, Literal
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -23,12 +23,74 @@ class Settings(BaseSettings):
         default=f"sqlite:///{(BASE_DIR / 'smart_attendance.db').as_posix()}",
         description="SQLAlchemy database URL",
     )
+    async_database_url: str | None = Field(
+        default=None,
+        description="Async SQLAlchemy URL; derived from database_url (asyncpg / aiosqlite) when unset",
+    )
+    db_pool_size: int = Field(default=5, ge=1, description="Persistent connections kept per engine")
+    db_max_overflow: int = Field(default=10, ge=0, description="Extra connections opened under burst load")
+    db_pool_timeout: float = Field(default=30.0, gt=0, description="Seconds to wait for a free connection")
+    db_pool_recycle: int = Field(default=-1, description="Recycle connections older than this many seconds; -1 never")
+    db_pool_pre_ping: bool = Field(
+        default=True,
+        description="Ping connections on checkout (pessimistic); disable to rely on recycle and error invalidation",
+    )
     secret_key: str = Field(default="CHANGE_ME", description="JWT secret key")
     algorithm: str = Field(default="HS256", description="JWT signing algorithm")
     access_token_expire_minutes: int = Field(default=60, description="JWT expiry in minutes")
+    auth_cache_ttl_seconds: float = Field(default=60.0, ge=0, description="How long a resolved token principal is reused")
+    auth_cache_max_entries: int = Field(default=1024, ge=0, description="Cached token principals; 0 disables the cache")
+    idempotency_key_ttl_seconds: float = Field(
+        default=600.0, ge=0, description="How long a mark-face Idempotency-Key replays its first response"
+    )
+    idempotency_cache_max_entries: int = Field(default=10000, ge=0, description="Remembered keys; 0 disables replay")
+    active_session_cache_ttl_seconds: float = Field(
+        default=300.0, ge=0, description="How long the session scans without a session_id go to is cached"
+    )
+    active_session_cache_max_entries: int = Field(default=1024, ge=0, description="Cached (course, day) sessions")
     cors_origins: List[str] = Field(default_factory=lambda: ["http://localhost:19006", "http://localhost:8081", "*"])
     face_model_path: Path = Field(default=APP_DIR / "ml" / "model" / "face_recognition.bin")
     face_match_threshold: float = Field(default=0.65)
+    face_model_mmap: bool = Field(
+        default=True, description="Memory-map model arrays and gallery sidecars so worker processes share them"
+    )
+    face_model_preload: bool = Field(
+        default=True, description="Load the face model in the background at startup instead of on first use"
+    )
+    face_model_load_wait_seconds: float = Field(
+        default=10.0, ge=0, description="How long an ML request waits for a loading model before answering 503"
+    )
+    face_model_watch_seconds: float = Field(
+        default=30.0, ge=0, description="Poll interval for artifact changes that trigger a hot reload; 0 disables"
+    )
+    face_top_k: int = Field(default=5, ge=1, description="Candidates reported per identification")
+    face_input_size: int = Field(default=160, ge=16, description="Side of the square RGB array fed to the encoder")
+    face_scene_max_side: int = Field(
+        default=1600, ge=64, description="Longest side group photos are decoded at before face detection"
+    )
+    face_ann_backend: Literal["none", "ivf", "hnsw"] = Field(
+        default="none", description="Approximate index for searches over the whole gallery (hnsw needs hnswlib)"
+    )
+    face_ann_min_rows: int = Field(default=20000, ge=0, description="Galleries smaller than this are searched exactly")
+    face_ann_nlist: int = Field(default=0, ge=0, description="IVF lists; 0 uses 4 * sqrt(gallery rows)")
+    face_ann_nprobe: int = Field(default=8, ge=1, description="IVF lists scanned per query (recall vs latency)")
+    face_ann_ef_search: int = Field(default=64, ge=1, description="HNSW search breadth (recall vs latency)")
+    face_gallery_dtype: Literal["float32", "float16", "int8"] = Field(
+        default="float32", description="In-memory gallery storage; float16 halves and int8 quarters its size"
+    )
+    face_partition_cache_max_entries: int = Field(
+        default=64, ge=0, description="Per-course gallery slices kept in memory by each recognizer"
+    )
+    face_partition_cache_ttl_seconds: float = Field(
+        default=600.0, ge=0, description="How long an unused per-course gallery slice is kept"
+    )
+    face_batch_max_size: int = Field(default=16, ge=1, description="Identify requests coalesced into one model call")
+    face_batch_max_wait_ms: float = Field(default=5.0, ge=0, description="How long a batch waits for more requests")
+    face_result_cache_ttl_seconds: float = Field(
+        default=30.0, ge=0, description="How long an identification is reused for a re-uploaded frame"
+    )
+    face_result_cache_max_entries: int = Field(default=1024, ge=0, description="Cached results; 0 disables the cache")
+    recognition_workers: int = Field(default=0, ge=0, description="Recognition worker processes; 0 runs in-process")
     media_root: Path = Field(default=BASE_DIR / "storage" / "media")
     media_url: str = Field(default="/media")
 
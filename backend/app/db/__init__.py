@@ -1,3 +1,21 @@
-from .session import Base, engine, get_session, session_scope
+from .session import (
+    Base,
+    async_engine,
+    engine,
+    get_async_session,
+    get_session,
+    pool_status,
+    session_scope,
+    upsert_insert,
+)
 
-__all__ = ["Base", "engine", "get_session", "session_scope"]
+__all__ = [
+    "Base",
+    "async_engine",
+    "engine",
+    "get_async_session",
+    "get_session",
+    "pool_status",
+    "session_scope",
+    "upsert_insert",
+]
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from typing import Any, Dict, Type
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+from app.config import settings
+
+# Upper bounds (seconds) of the checkout wait histogram buckets.
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PoolMetrics:
+    """Checkout/checkin counters and a wait-time histogram for one connection pool."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.wait_counts = [0] * (len(WAIT_BUCKETS) + 1)
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+
+    def observe_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.wait_counts[bisect.bisect_left(WAIT_BUCKETS, seconds)] += 1
+            self.wait_sum += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def attach(self, engine: Engine) -> None:
+        event.listen(engine, "connect", lambda *_: self.count("connects"))
+        event.listen(engine, "checkout", lambda *_: self.count("checkouts"))
+        event.listen(engine, "checkin", lambda *_: self.count("checkins"))
+        event.listen(engine, "invalidate", lambda *_: self.count("invalidations"))
+
+    def snapshot(self, pool: Pool) -> Dict[str, Any]:
+        with self._lock:
+            cumulative, histogram = 0, []
+            for bound, count in zip((*WAIT_BUCKETS, float("inf")), self.wait_counts):
+                cumulative += count
+                histogram.append({"le": "+Inf" if bound == float("inf") else bound, "count": cumulative})
+            observed = sum(self.wait_counts)
+            data: Dict[str, Any] = {
+                "pool": type(pool).__name__,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_seconds": {
+                    "count": observed,
+                    "sum": round(self.wait_sum, 6),
+                    "avg": round(self.wait_sum / observed, 6) if observed else 0.0,
+                    "max": round(self.wait_max, 6),
+                    "histogram": histogram,
+                },
+            }
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            data.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+                saturation=round(pool.checkedout() / capacity, 4) if capacity else None,
+            )
+        return data
+
+
+def instrumented_pool_class(base: Type[QueuePool], metrics: PoolMetrics) -> Type[QueuePool]:
+    """Subclass `base` so every checkout records how long it waited for a connection.
+
+    A class (not an instance attribute) is used because `Engine.dispose()` rebuilds
+    the pool through `pool.recreate()`, which instantiates `type(pool)` again.
+    """
+
+    class InstrumentedPool(base):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            except PoolTimeoutError:
+                metrics.count("timeouts")
+                raise
+            finally:
+                metrics.observe_wait(time.perf_counter() - started)
+
+    InstrumentedPool.__name__ = InstrumentedPool.__qualname__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
+
+
+def engine_options(url: str, metrics: PoolMetrics, is_async: bool = False) -> Dict[str, Any]:
+    """Keyword arguments for `create_engine` / `create_async_engine` from the pool settings."""
+    options: Dict[str, Any] = {"pool_pre_ping": settings.db_pool_pre_ping}
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return options  # in-memory SQLite uses a single-connection pool with no sizing
+    options.update(
+        poolclass=instrumented_pool_class(AsyncAdaptedQueuePool if is_async else QueuePool, metrics),
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+    )
+    return options
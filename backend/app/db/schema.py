@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from loguru import logger
+from sqlalchemy import case, delete, func, insert, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateColumn
+
+from app.db.session import Base
+from app.models import AttendanceDailyRollup, AttendanceRecord, AttendanceSession, AttendanceStatus
+
+# `create_all` creates missing tables but never alters existing ones. Databases
+# the API created itself (the default SQLite file in particular) are brought up
+# to the current models here; PostgreSQL deployments managed with the Alembic
+# migrations in `database/` already match them, so every step is a no-op there.
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """Create missing tables, then add the columns and indexes older databases lack."""
+    existing = set(inspect(engine).get_table_names())
+    Base.metadata.create_all(bind=engine)
+    if not existing:
+        return
+    with engine.begin() as connection:
+        _add_missing_columns(connection, existing)
+        deduplicated = _one_record_per_student(connection)
+        _create_missing_indexes(connection, existing)
+        if deduplicated or AttendanceDailyRollup.__tablename__ not in existing:
+            _rebuild_rollups(connection)
+
+
+def _add_missing_columns(connection: Connection, existing: set[str]) -> None:
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present:
+                continue
+            # Only additive columns (nullable or with a server default) are added this way.
+            definition = CreateColumn(column).compile(dialect=connection.dialect)
+            logger.info("Adding column {}.{}", table.name, column.name)
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {definition}"))
+
+
+def _create_missing_indexes(connection: Connection, existing: set[str]) -> None:
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        present = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in present:
+                logger.info("Creating index {}", index.name)
+                index.create(connection)
+
+
+def _one_record_per_student(connection: Connection) -> bool:
+    """Add `uq_attendance_session_student` when missing, keeping each student's first record.
+
+    Returns whether the constraint had to be added (and the rollup must be rebuilt).
+    """
+    inspector = inspect(connection)
+    table = AttendanceRecord.__table__
+    names = {constraint["name"] for constraint in inspector.get_unique_constraints(table.name)}
+    names |= {index["name"] for index in inspector.get_indexes(table.name) if index["unique"]}
+    if "uq_attendance_session_student" in names:
+        return False
+    first = select(func.min(table.c.id)).where(table.c.student_id.is_not(None)).group_by(
+        table.c.session_id, table.c.student_id
+    )
+    removed = connection.execute(
+        delete(table).where(table.c.student_id.is_not(None), table.c.id.not_in(first))
+    ).rowcount
+    logger.info("Creating uq_attendance_session_student; removed {} duplicate attendance records", removed)
+    # A unique index enforces the constraint and serves `ON CONFLICT (session_id, student_id)` alike.
+    connection.execute(
+        text(f"CREATE UNIQUE INDEX uq_attendance_session_student ON {table.name} (session_id, student_id)")
+    )
+    return True
+
+
+def _rebuild_rollups(connection: Connection) -> None:
+    records, sessions = AttendanceRecord.__table__, AttendanceSession.__table__
+    rollups = AttendanceDailyRollup.__table__
+    counts = [
+        func.sum(case((records.c.status == status, 1), else_=0)).label(status.value) for status in AttendanceStatus
+    ]
+    totals = (
+        select(sessions.c.course_id, sessions.c.session_date, records.c.student_id, *counts)
+        .select_from(records)
+        .join(sessions, sessions.c.id == records.c.session_id)
+        .where(records.c.student_id.is_not(None))
+        .group_by(sessions.c.course_id, sessions.c.session_date, records.c.student_id)
+    )
+    connection.execute(delete(rollups))
+    connection.execute(
+        insert(rollups).from_select(
+            ["course_id", "session_date", "student_id", *(status.value for status in AttendanceStatus)], totals
+        )
+    )
@@ -1,20 +1,54 @@
 from __future__ import annotations
 
 from contextlib import contextmanager
+from typing import AsyncIterator
 
-from sqlalchemy import create_engine
+from sqlalchemy import Table, create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
 
 from app.config import settings
+from app.db.pool import PoolMetrics, engine_options
 
 
 class Base(DeclarativeBase):
     pass
 
 
-engine = create_engine(settings.database_url, future=True, pool_pre_ping=True)
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_database_url(url: str) -> str:
+    """Swap the sync DBAPI driver for its asyncio counterpart (asyncpg / aiosqlite)."""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = settings.async_database_url or async_database_url(settings.database_url)
+
+pool_metrics = {"sync": PoolMetrics(), "async": PoolMetrics()}
+
+engine = create_engine(settings.database_url, future=True, **engine_options(settings.database_url, pool_metrics["sync"]))
+pool_metrics["sync"].attach(engine)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False, class_=Session)
 
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, pool_metrics["async"], is_async=True)
+)
+pool_metrics["async"].attach(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession)
+
+
+UPSERT_DIALECTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def upsert_insert(db: Session, target: Table | type):
+    """`INSERT` with `ON CONFLICT` support for the session's database (PostgreSQL or SQLite)."""
+    return UPSERT_DIALECTS[db.get_bind().dialect.name](target)
+
 
 def get_session() -> Session:
     session = SessionLocal()
@@ -24,6 +58,11 @@ def get_session() -> Session:
         session.close()
 
 
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
 @contextmanager
 def session_scope() -> Session:
     session = SessionLocal()
@@ -35,3 +74,11 @@ def session_scope() -> Session:
         raise
     finally:
         session.close()
+
+
+def pool_status() -> dict:
+    """Live pool occupancy plus checkout counters and wait histograms for both engines."""
+    return {
+        "sync": pool_metrics["sync"].snapshot(engine.pool),
+        "async": pool_metrics["async"].snapshot(async_engine.sync_engine.pool),
+    }
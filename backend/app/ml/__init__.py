@@ -1,3 +1,3 @@
-from .recognizer import decode_base64_image, recognizer
+from .recognizer import decode_base64_image, get_recognizer, load_recognizer, recognizer_status
 
-__all__ = ["recognizer", "decode_base64_image"]
+__all__ = ["decode_base64_image", "get_recognizer", "load_recognizer", "recognizer_status"]
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+from app.ml.gallery import EmbeddingGallery, normalize_rows
+
+# Approximate nearest-neighbour indexes for institution-wide identification.
+# An index only proposes candidate gallery rows; the gallery rescores them
+# exactly, so approximation can miss a match but never misreport a score.
+
+
+@dataclass(frozen=True)
+class AnnConfig:
+    backend: str = "none"  # "none", "ivf" or "hnsw"
+    min_rows: int = 20000  # smaller galleries are searched exactly
+    nlist: int = 0  # IVF lists; 0 picks 4 * sqrt(rows)
+    nprobe: int = 8  # IVF lists scanned per query: higher is slower with better recall
+    ef_search: int = 64  # HNSW search breadth: higher is slower with better recall
+
+
+class IVFIndex:
+    """Inverted-file index over unit vectors, clustered with spherical k-means."""
+
+    kind = "ivf"
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, rows: np.ndarray, nprobe: int = 8):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+        self.nprobe = max(1, min(nprobe, len(centroids)))
+
+    @classmethod
+    def build(
+        cls, embeddings: np.ndarray, nlist: int = 0, nprobe: int = 8, iterations: int = 10, seed: int = 0
+    ) -> "IVFIndex":
+        count = len(embeddings)
+        nlist = max(1, min(nlist or int(4 * np.sqrt(count)), count))
+        rng = np.random.default_rng(seed)
+        # Train on a sample (64 points per list is plenty), then assign every row.
+        sample = np.asarray(embeddings[np.sort(rng.choice(count, size=min(count, nlist * 64), replace=False))])
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            members = np.bincount(assignment, minlength=nlist)
+            centroids = normalize_rows(np.where(members[:, None] > 0, sums, centroids))
+
+        assignment = np.concatenate(
+            [np.argmax(embeddings[start : start + 65536] @ centroids.T, axis=1) for start in range(0, count, 65536)]
+        )
+        rows = np.argsort(assignment, kind="stable")
+        offsets = np.searchsorted(assignment[rows], np.arange(nlist + 1))
+        return cls(centroids, offsets, rows, nprobe)
+
+    def candidates(self, query: np.ndarray, window: int) -> np.ndarray:
+        closeness = self.centroids @ query
+        probe = np.argpartition(closeness, -self.nprobe)[-self.nprobe :]
+        return np.concatenate([self.rows[self.offsets[cell] : self.offsets[cell + 1]] for cell in probe])
+
+    def save(self, path: Path, fingerprint: str) -> None:
+        with open(path, "wb") as handle:
+            np.savez(handle, centroids=self.centroids, offsets=self.offsets, rows=self.rows, fingerprint=fingerprint)
+
+    @classmethod
+    def load(cls, path: Path, config: AnnConfig) -> tuple["IVFIndex", str]:
+        with np.load(path) as data:
+            index = cls(data["centroids"], data["offsets"], data["rows"], config.nprobe)
+            return index, str(data["fingerprint"])
+
+
+class HNSWIndex:
+    """Graph index backed by the optional `hnswlib` package."""
+
+    kind = "hnsw"
+
+    def __init__(self, index, ef_search: int = 64):
+        self.index = index
+        self.index.set_ef(ef_search)  # hnswlib widens this to k for larger queries
+
+    @staticmethod
+    def _hnswlib():
+        try:
+            import hnswlib
+        except ImportError as exc:  # pragma: no cover - optional dependency
+            raise RuntimeError("FACE_ANN_BACKEND=hnsw requires the hnswlib package") from exc
+        return hnswlib
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, ef_search: int = 64) -> "HNSWIndex":
+        index = cls._hnswlib().Index(space="ip", dim=embeddings.shape[1])
+        index.init_index(max_elements=len(embeddings), ef_construction=200, M=16)
+        index.add_items(embeddings, np.arange(len(embeddings)))
+        return cls(index, ef_search)
+
+    def candidates(self, query: np.ndarray, window: int) -> np.ndarray:
+        k = min(window, self.index.get_current_count())
+        labels, _ = self.index.knn_query(query, k=k)
+        return labels[0].astype(np.int64)
+
+    def save(self, path: Path, fingerprint: str) -> None:
+        self.index.save_index(str(path))
+        meta = {"fingerprint": fingerprint, "dimension": self.index.dim}
+        path.with_name(f"{path.name}.json").write_text(json.dumps(meta))
+
+    @classmethod
+    def load(cls, path: Path, config: AnnConfig) -> tuple["HNSWIndex", str]:
+        meta = json.loads(path.with_name(f"{path.name}.json").read_text())
+        fingerprint = meta["fingerprint"]
+        index = cls._hnswlib().Index(space="ip", dim=meta["dimension"])
+        index.load_index(str(path))
+        return cls(index, config.ef_search), fingerprint
+
+
+INDEX_TYPES = {"ivf": (IVFIndex, ".ivf.npz"), "hnsw": (HNSWIndex, ".hnsw.bin")}
+
+
+def index_path(model_path: Path, backend: str) -> Path:
+    stem = model_path.with_suffix("")
+    return stem.with_name(f"{stem.name}{INDEX_TYPES[backend][1]}")
+
+
+def build_index(gallery: EmbeddingGallery, config: AnnConfig):
+    if config.backend == "ivf":
+        return IVFIndex.build(gallery.embeddings, nlist=config.nlist, nprobe=config.nprobe)
+    return HNSWIndex.build(np.asarray(gallery.embeddings), ef_search=config.ef_search)
+
+
+def load_or_build(model_path: Path, gallery: EmbeddingGallery, config: AnnConfig, fingerprint: str):
+    """ANN index for `gallery`: read from disk when it matches the artifact, otherwise built and saved.
+
+    Returns `None` (exact search) when disabled, when the gallery is small, or
+    when the backend is unavailable.
+    """
+    if config.backend not in INDEX_TYPES or len(gallery) < config.min_rows:
+        return None
+    index_type, _ = INDEX_TYPES[config.backend]
+    path = index_path(model_path, config.backend)
+    try:
+        if path.exists():
+            index, built_for = index_type.load(path, config)
+            if built_for == fingerprint:
+                logger.info("Loaded {} index for {} gallery rows from {}", config.backend, len(gallery), path)
+                return index
+        index = build_index(gallery, config)
+    except (RuntimeError, OSError, ValueError, KeyError) as exc:
+        logger.warning("ANN index unavailable, using exact search: {}", exc)
+        return None
+    try:
+        index.save(path, fingerprint)
+    except OSError as exc:
+        logger.warning("Could not persist ANN index to {}: {}", path, exc)
+    logger.info("Built {} index for {} gallery rows", config.backend, len(gallery))
+    return index
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.ml.gallery import GALLERY_DTYPES, EmbeddingGallery, normalize_rows, quantize_rows
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    import msvcrt
+
+    fcntl = None
+
+# Large arrays live in `.npy` sidecars next to the model artifact, e.g.
+#   face_recognition.bin                 joblib dump of the encoder
+#   face_recognition.embeddings.npy      (n, dim) float32 / float16 / int8, rows L2-normalised
+#   face_recognition.student_ids.npy     (n,) int64
+#   face_recognition.scales.npy          (n,) float32 per-row scales, int8 embeddings only
+# Sidecars are opened with `mmap_mode="r"`, so every process serving the model
+# shares one read-only copy of the gallery through the OS page cache.
+#
+# Enrolments made through the API are appended to a journal,
+#   face_recognition.gallery.jsonl      {"generation"} header line, then one line per change:
+#                                        {"op": "upsert" | "remove", "student_id", "embeddings"}
+# which every process replays on top of the sidecars; `compact` folds it back in
+# and replaces the file with an empty journal of a new generation. Appends and
+# compaction serialise on face_recognition.gallery.lock.
+
+
+class JournalPosition(NamedTuple):
+    """How far a process has replayed the journal: its generation, inode and byte offset."""
+
+    generation: str = ""
+    inode: int = 0
+    offset: int = 0
+
+
+class Sidecars(NamedTuple):
+    embeddings: np.ndarray
+    student_ids: np.ndarray
+    scales: Optional[np.ndarray]
+
+    @property
+    def dtype(self) -> str:
+        return "int8" if self.scales is not None else self.embeddings.dtype.name
+
+
+def sidecar_paths(model_path: Path) -> Tuple[Path, Path]:
+    stem = model_path.with_suffix("")
+    return stem.with_name(f"{stem.name}.embeddings.npy"), stem.with_name(f"{stem.name}.student_ids.npy")
+
+
+def scales_path(model_path: Path) -> Path:
+    stem = model_path.with_suffix("")
+    return stem.with_name(f"{stem.name}.scales.npy")
+
+
+def _write_atomically(path: Path, array: np.ndarray) -> None:
+    temp_path = path.with_name(f".{path.name}.tmp")
+    with open(temp_path, "wb") as handle:
+        np.save(handle, array)
+    temp_path.replace(path)
+
+
+def journal_path(model_path: Path) -> Path:
+    stem = model_path.with_suffix("")
+    return stem.with_name(f"{stem.name}.gallery.jsonl")
+
+
+def lock_path(model_path: Path) -> Path:
+    stem = model_path.with_suffix("")
+    return stem.with_name(f"{stem.name}.gallery.lock")
+
+
+@contextmanager
+def journal_lock(model_path: Path) -> Iterator[None]:
+    """Exclusive cross-process lock taken by journal appends and `compact`."""
+    with open(lock_path(model_path), "a+b") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _start_journal(model_path: Path) -> None:
+    """Atomically replace the journal with an empty one of a fresh generation."""
+    path = journal_path(model_path)
+    temp_path = path.with_name(f".{path.name}.tmp")
+    temp_path.write_bytes((json.dumps({"generation": uuid.uuid4().hex}) + "\n").encode())
+    temp_path.replace(path)
+
+
+def _journal_generation(header: bytes) -> Optional[str]:
+    try:
+        entry = json.loads(header)
+    except ValueError:
+        return None
+    return entry.get("generation") if isinstance(entry, dict) else None
+
+
+def append_journal(model_path: Path, op: str, student_id: int, embeddings: Optional[np.ndarray] = None) -> None:
+    """Record one enrolment change, under the journal lock so `compact` cannot drop it."""
+    entry: Dict[str, Any] = {"op": op, "student_id": int(student_id)}
+    if embeddings is not None:
+        entry["embeddings"] = np.asarray(embeddings, dtype=np.float32).tolist()
+    line = (json.dumps(entry, separators=(",", ":")) + "\n").encode()
+    with journal_lock(model_path):
+        if not journal_path(model_path).exists():
+            _start_journal(model_path)
+        handle = os.open(journal_path(model_path), os.O_WRONLY | os.O_APPEND)
+        try:
+            os.write(handle, line)
+        finally:
+            os.close(handle)
+
+
+def read_journal(
+    model_path: Path, position: JournalPosition = JournalPosition()
+) -> Tuple[List[Dict[str, Any]], JournalPosition]:
+    """Complete journal entries after `position`, and the position to resume from.
+
+    A position from an earlier generation (the journal was compacted since)
+    restarts at the first entry of the new one; callers detect that from the
+    returned position and reload the compacted sidecars first.
+    """
+    path = journal_path(model_path)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return [], JournalPosition()
+    if stat.st_ino == position.inode and stat.st_size == position.offset:
+        return [], position
+    with open(path, "rb") as handle:
+        inode = os.fstat(handle.fileno()).st_ino
+        header = handle.readline()
+        generation = _journal_generation(header)
+        start = len(header) if generation is not None else 0  # journals written before generations had no header
+        generation = generation or ""
+        offset = position.offset if (generation, inode) == (position.generation, position.inode) else start
+        handle.seek(offset)
+        data = handle.read()
+    complete = data[: data.rfind(b"\n") + 1]  # a concurrent writer may not have finished its line
+    entries = [json.loads(line) for line in complete.splitlines() if line.strip()]
+    return entries, JournalPosition(generation, inode, offset + len(complete))
+
+
+def apply_journal(
+    gallery: Optional[EmbeddingGallery], entries: List[Dict[str, Any]], dtype: str = "float32"
+) -> Optional[EmbeddingGallery]:
+    """Apply journal entries to `gallery`, creating one on the first enrolment when there is none."""
+    for entry in entries:
+        if entry["op"] == "upsert":
+            embeddings = np.asarray(entry["embeddings"], dtype=np.float32)
+            if gallery is None:
+                gallery = EmbeddingGallery.empty(embeddings.shape[1], dtype=dtype)
+            gallery.upsert(entry["student_id"], embeddings)
+        elif entry["op"] == "remove" and gallery is not None:
+            gallery.remove(entry["student_id"])
+    return gallery
+
+
+def fingerprint(model_path: Path) -> str:
+    """Short version id of the artifact files, changing whenever any of them is rewritten."""
+    digest = hashlib.sha1()
+    for path in (model_path, *sidecar_paths(model_path), scales_path(model_path)):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        digest.update(f"{path.name}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+    return digest.hexdigest()[:12]
+
+
+def load_sidecars(model_path: Path, mmap: bool = True) -> Optional[Sidecars]:
+    """Memory-map the gallery sidecars of `model_path`, or `None` when there are none."""
+    embeddings_path, ids_path = sidecar_paths(model_path)
+    if not (embeddings_path.exists() and ids_path.exists()):
+        return None
+    mode = "r" if mmap else None
+    embeddings = np.load(embeddings_path, mmap_mode=mode)
+    scales = np.load(scales_path(model_path), mmap_mode=mode) if embeddings.dtype == np.int8 else None
+    return Sidecars(embeddings, np.load(ids_path, mmap_mode=mode), scales)
+
+
+def save_sidecars(
+    model_path: Path, embeddings: np.ndarray, student_ids: Iterable[int], dtype: str = "float32"
+) -> None:
+    """Write normalised gallery sidecars stored as `dtype`; each file is replaced atomically."""
+    rows = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+    ids = np.ascontiguousarray(np.asarray(list(student_ids), dtype=np.int64).reshape(-1))
+    if ids.shape[0] != rows.shape[0]:
+        raise ValueError("Gallery embeddings and student_ids differ in length")
+    storage, scales = quantize_rows(rows, dtype)
+    if scales is not None:
+        _write_atomically(scales_path(model_path), scales)
+    for path, array in zip(sidecar_paths(model_path), (storage, ids)):
+        _write_atomically(path, array)
+    if scales is None:
+        scales_path(model_path).unlink(missing_ok=True)
+
+
+def save_artifact(model_path: Path, encoder, embeddings: np.ndarray, student_ids: Iterable[int]) -> None:
+    """Store an encoder with joblib and its gallery as memory-mappable sidecars.
+
+    Files are written beside their target and renamed into place, so processes
+    still mapping the previous version keep reading intact pages.
+    """
+    import joblib
+
+    save_sidecars(model_path, embeddings, student_ids)
+    temp_path = model_path.with_name(f".{model_path.name}.tmp")
+    joblib.dump(encoder, temp_path)
+    temp_path.replace(model_path)
+
+
+def convert(model_path: Path) -> None:
+    """Split a bundled `{"encoder", "embeddings", "student_ids"}` artifact into encoder + sidecars."""
+    import joblib
+
+    artifact = joblib.load(model_path)
+    if isinstance(artifact, dict) and "encoder" in artifact:
+        encoder, embeddings, student_ids = artifact["encoder"], artifact["embeddings"], artifact["student_ids"]
+    else:
+        encoder, embeddings, student_ids = artifact, artifact.embeddings, artifact.student_ids
+        # Drop the in-object copies so they are not pickled alongside the sidecars.
+        for attribute in ("embeddings", "student_ids"):
+            if attribute in vars(encoder):
+                delattr(encoder, attribute)
+    save_artifact(model_path, encoder, embeddings, student_ids)
+
+
+def _load_gallery(model_path: Path) -> Optional[EmbeddingGallery]:
+    sidecars = load_sidecars(model_path, mmap=False)
+    if sidecars is None:
+        return None
+    embeddings, student_ids, scales = sidecars
+    return EmbeddingGallery(embeddings, student_ids, normalized=True, dtype=sidecars.dtype, scales=scales)
+
+
+def quantize(model_path: Path, dtype: str, threshold: float) -> Dict[str, Any]:
+    """Rewrite the sidecars as `dtype` and return the accuracy report for the change."""
+    from app.ml.quantization import quantization_report
+
+    gallery = _load_gallery(model_path)
+    if gallery is None:
+        raise ValueError(f"{model_path} has no gallery sidecars; run `convert` first")
+    embeddings, student_ids = gallery.embeddings, np.array(gallery.student_ids)
+    report = quantization_report(embeddings, dtype, threshold)
+    save_sidecars(model_path, embeddings, student_ids, dtype=dtype)
+    return report
+
+
+def compact(model_path: Path) -> None:
+    """Fold the enrolment journal into the sidecars and start a new journal generation.
+
+    Holds the journal lock throughout, so no enrolment is appended in between,
+    and swaps in the new journal with a rename. A reader that sees the new
+    generation must reload the sidecars before replaying it, since entries it
+    had not replayed yet now live only in the sidecars.
+    """
+    with journal_lock(model_path):
+        gallery = _load_gallery(model_path)
+        entries, _ = read_journal(model_path)
+        gallery = apply_journal(gallery, entries)
+        if gallery is None or not entries:
+            return
+        live = gallery.student_ids >= 0
+        save_sidecars(model_path, gallery.embeddings[live], gallery.student_ids[live], dtype=gallery.dtype)
+        _start_journal(model_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain face model artifacts")
+    parser.add_argument(
+        "command",
+        choices=["convert", "compact", "quantize"],
+        help="convert: move a bundle's gallery into .npy sidecars; compact: fold the enrolment journal into them; "
+        "quantize: store the sidecars as --dtype and print the accuracy report",
+    )
+    parser.add_argument("model_path", type=Path)
+    parser.add_argument("--dtype", choices=GALLERY_DTYPES, default="int8")
+    parser.add_argument("--threshold", type=float, default=None, help="defaults to FACE_MATCH_THRESHOLD")
+    arguments = parser.parse_args()
+    if arguments.command == "quantize":
+        from app.config import settings
+
+        threshold = settings.face_match_threshold if arguments.threshold is None else arguments.threshold
+        print(json.dumps(quantize(arguments.model_path, arguments.dtype, threshold), indent=2))
+    else:
+        {"convert": convert, "compact": compact}[arguments.command](arguments.model_path)
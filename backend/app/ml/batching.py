@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Executor
+from typing import Callable, Generic, List, Optional, Sequence, Set, Tuple, TypeVar
+
+from loguru import logger
+
+JobT = TypeVar("JobT")
+ResultT = TypeVar("ResultT")
+
+
+class MicroBatcher(Generic[JobT, ResultT]):
+    """Coalesce concurrent jobs into batches executed off the event loop.
+
+    The first queued job opens a batch that closes after `max_wait_ms` or once
+    `max_batch_size` jobs have arrived. The handler runs in `executor` (the
+    default thread pool when `None`) and returns one result or exception per
+    job, so a bad image only fails its own caller.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Sequence[JobT]], Sequence[object]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        max_in_flight: int = 1,
+        executor: Executor | None = None,
+    ):
+        self.handler = handler
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_in_flight = max(1, max_in_flight)
+        self.executor = executor
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue[Tuple[JobT, asyncio.Future]]] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatches: Set[asyncio.Task] = set()
+
+    async def submit(self, job: JobT) -> ResultT:
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((job, future))
+        return await future
+
+    async def aclose(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._loop = self._queue = self._worker = self._slots = None
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        # Test clients and reloaders may run several event loops over the process lifetime.
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+            self._worker = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._slots.acquire()
+            task = self._loop.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: List[Tuple[JobT, asyncio.Future]]) -> None:
+        jobs = [job for job, _ in batch]
+        slots = self._slots
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self.executor, self.handler, jobs)
+        except Exception as exc:  # handler failed as a whole; fail every caller
+            logger.exception("Batched job handler failed")
+            results = [exc] * len(jobs)
+        finally:
+            slots.release()
+
+        for (_, future), result in zip(batch, results):
+            if future.done():  # caller went away (e.g. client disconnect)
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+GALLERY_DTYPES = ("float32", "float16", "int8")
+# Rows dequantised per step when scoring compact galleries; bounds the float32 scratch space.
+SCORE_BLOCK_ROWS = 16384
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalise each row; all-zero rows are left as zeros."""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def quantize_rows(rows: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Store float32 rows as `dtype`; int8 rows get a per-row scale (`row ~= q * scale`)."""
+    if dtype not in GALLERY_DTYPES:
+        raise ValueError(f"Unsupported gallery dtype {dtype!r}")
+    if dtype != "int8":
+        return np.ascontiguousarray(rows, dtype=dtype), None
+    scales = np.abs(rows).max(axis=1) / 127.0 if len(rows) else np.zeros(0)
+    scales[scales == 0] = 1.0
+    quantized = np.clip(np.rint(rows / scales[:, None]), -127, 127).astype(np.int8)
+    return np.ascontiguousarray(quantized), scales.astype(np.float32)
+
+
+def dequantize_rows(storage: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    rows = storage.astype(np.float32, copy=False)  # int8 / float16 always copy, so scaling in place is safe
+    if scales is not None:
+        rows *= scales[:, None]
+    return rows
+
+
+def score_rows(queries: np.ndarray, storage: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    """`queries @ rows.T` for float32, float16 or int8 storage, dequantising block by block."""
+    if storage.dtype == np.float32:
+        return queries @ storage.T
+    scores = np.empty((len(queries), len(storage)), dtype=np.float32)
+    for start in range(0, len(storage), SCORE_BLOCK_ROWS):
+        stop = start + SCORE_BLOCK_ROWS
+        np.matmul(queries, storage[start:stop].astype(np.float32).T, out=scores[:, start:stop])
+        if scales is not None:
+            scores[:, start:stop] *= scales[start:stop]  # q . (s * x) == s * (q . x)
+    return scores
+
+
+class EmbeddingGallery:
+    """Enrolled face embeddings stored as one contiguous matrix.
+
+    Rows are L2-normalised so a single matrix-vector product yields cosine
+    similarities; `student_ids[i]` owns row `i`. A student may own several rows.
+    Pass `normalized=True` for rows that are already unit-length float32 (e.g.
+    memory-mapped sidecars) to use them in place without a private copy.
+
+    `dtype` selects float32, float16 (half the memory) or int8 with one float32
+    scale per row (a quarter); compact rows are dequantised block by block
+    while scoring. Pre-quantised int8 rows are passed together with `scales`.
+
+    `upsert` and `remove` change one student in O(their rows): new rows are
+    appended into spare capacity and removed rows become zeroed tombstones
+    (id -1) that are compacted away once they make up a quarter of the matrix.
+
+    An attached ANN index (see `app.ml.ann`) narrows full-gallery searches to
+    candidate rows; rows appended after it was built are always scanned, and
+    compaction drops the index because it renumbers rows.
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        student_ids: Iterable[int],
+        normalized: bool = False,
+        dtype: str = "float32",
+        scales: Optional[np.ndarray] = None,
+    ):
+        matrix = np.asarray(embeddings)
+        if matrix.ndim != 2:
+            raise ValueError("Gallery embeddings must be a 2-D matrix")
+        ids = np.asarray(student_ids, dtype=np.int64).reshape(-1)
+        if ids.shape[0] != matrix.shape[0]:
+            raise ValueError("Gallery embeddings and student_ids differ in length")
+
+        if scales is not None:
+            if matrix.dtype != np.int8:
+                raise ValueError("Per-row scales are only used with int8 embeddings")
+            dtype, scales = "int8", np.asarray(scales, dtype=np.float32).reshape(-1)
+        elif not (normalized and matrix.dtype == np.dtype(dtype) and dtype != "int8" and matrix.flags.c_contiguous):
+            matrix, scales = quantize_rows(normalize_rows(matrix.astype(np.float32, copy=False)), dtype)
+        self.dtype = dtype
+        self._matrix = matrix
+        self._scales = scales
+        self._ids = np.ascontiguousarray(ids)
+        self._size = int(ids.shape[0])
+        self._tombstones = 0
+        self._rows: Optional[Dict[int, List[int]]] = None
+        self._index = None
+        self._indexed_rows = 0
+        self._lock = threading.Lock()
+        _, counts = np.unique(self._ids, return_counts=True)
+        self.max_rows_per_student = int(counts.max()) if counts.size else 0
+
+    @classmethod
+    def empty(cls, dimension: int, dtype: str = "float32") -> "EmbeddingGallery":
+        return cls(np.zeros((0, dimension), dtype=np.float32), [], dtype=dtype)
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """Rows as float32; a dequantised copy for float16 / int8 galleries."""
+        storage, scales, _ = self._view()
+        return storage if scales is None and storage.dtype == np.float32 else dequantize_rows(storage, scales)
+
+    @property
+    def nbytes(self) -> int:
+        scales = 0 if self._scales is None else self._scales[: self._size].nbytes
+        return int(self._matrix[: self._size].nbytes + scales)
+
+    @property
+    def student_ids(self) -> np.ndarray:
+        return self._ids[: self._size]
+
+    def __len__(self) -> int:
+        return self._size - self._tombstones
+
+    @property
+    def dimension(self) -> int:
+        return int(self._matrix.shape[1])
+
+    def subset(self, student_ids: Iterable[int]) -> "EmbeddingGallery":
+        """Gallery restricted to the rows owned by `student_ids`."""
+        storage, scales, ids = self._view()
+        mask = np.isin(ids, np.fromiter(student_ids, dtype=np.int64))
+        return EmbeddingGallery(
+            storage[mask],
+            ids[mask],
+            normalized=True,
+            dtype=self.dtype,
+            scales=None if scales is None else scales[mask],
+        )
+
+    @property
+    def index(self):
+        return self._index
+
+    def attach_index(self, index) -> None:
+        """Use `index` (built over the current rows) to shortlist rows in `search`."""
+        with self._lock:
+            self._index, self._indexed_rows = index, self._size
+
+    def upsert(self, student_id: int, embeddings: np.ndarray) -> None:
+        """Replace every row of `student_id` with `embeddings`."""
+        rows = normalize_rows(np.atleast_2d(np.asarray(embeddings, dtype=np.float32)))
+        if rows.shape[1] != self.dimension:
+            raise ValueError(f"Embedding dimension {rows.shape[1]} does not match gallery dimension {self.dimension}")
+        storage, scales = quantize_rows(rows, self.dtype)
+        with self._lock:
+            self._remove_locked(student_id)
+            self._reserve_locked(len(rows))
+            start = self._size
+            self._matrix[start : start + len(rows)] = storage
+            if scales is not None:
+                self._scales[start : start + len(rows)] = scales
+            self._ids[start : start + len(rows)] = student_id
+            self._size += len(rows)  # published only once the rows are written
+            self._row_index()[student_id] = list(range(start, self._size))
+            self.max_rows_per_student = max(self.max_rows_per_student, len(rows))
+            self._maybe_compact_locked()
+
+    def remove(self, student_id: int) -> int:
+        """Drop every row of `student_id`; returns how many were removed."""
+        with self._lock:
+            removed = self._remove_locked(student_id)
+            self._maybe_compact_locked()
+        return removed
+
+    def _view(self) -> Tuple[np.ndarray, Optional[np.ndarray], np.ndarray]:
+        with self._lock:
+            scales = None if self._scales is None else self._scales[: self._size]
+            return self._matrix[: self._size], scales, self._ids[: self._size]
+
+    def _row_index(self) -> Dict[int, List[int]]:
+        # Built on the first change only, so read-only galleries never pay for it.
+        if self._rows is None:
+            ids = self._ids[: self._size]
+            order = np.argsort(ids, kind="stable")
+            unique, starts = np.unique(ids[order], return_index=True)
+            self._rows = {
+                int(student_id): rows.tolist()
+                for student_id, rows in zip(unique, np.split(order, starts[1:]))
+                if student_id >= 0
+            }
+        return self._rows
+
+    def _remove_locked(self, student_id: int) -> int:
+        rows = self._row_index().pop(student_id, [])
+        if rows:
+            self._reserve_locked(0)
+            self._matrix[rows] = 0
+            self._ids[rows] = -1
+            self._tombstones += len(rows)
+        return len(rows)
+
+    def _reserve_locked(self, extra: int) -> None:
+        needed = self._size + extra
+        arrays = [self._matrix, self._ids] + ([] if self._scales is None else [self._scales])
+        if all(array.flags.writeable for array in arrays) and needed <= self._matrix.shape[0]:
+            return
+        # Grow geometrically so appends stay amortised O(rows); this is also the
+        # one-off private copy made before changing a memory-mapped gallery.
+        self._resize_locked(max(needed, int(self._matrix.shape[0] * 1.5), 64), slice(0, self._size))
+
+    def _resize_locked(self, capacity: int, keep) -> None:
+        kept_ids = self._ids[: self._size][keep]
+        matrix = np.zeros((capacity, self.dimension), dtype=self._matrix.dtype)
+        ids = np.full(capacity, -1, dtype=np.int64)
+        matrix[: len(kept_ids)] = self._matrix[: self._size][keep]
+        ids[: len(kept_ids)] = kept_ids
+        if self._scales is not None:
+            scales = np.ones(capacity, dtype=np.float32)
+            scales[: len(kept_ids)] = self._scales[: self._size][keep]
+            self._scales = scales
+        self._matrix, self._ids = matrix, ids
+
+    def _maybe_compact_locked(self) -> None:
+        if self._tombstones < 64 or self._tombstones * 4 < self._size:
+            return
+        live = self._ids[: self._size] >= 0
+        count = int(live.sum())
+        self._resize_locked(max(count * 3 // 2, 64), live)
+        self._size, self._tombstones, self._rows = count, 0, None
+        self._index, self._indexed_rows = None, 0
+
+    def search(self, query: np.ndarray, k: int = 5, threshold: float | None = None) -> List[Tuple[int, float]]:
+        """Return up to `k` distinct `(student_id, score)` pairs, best first."""
+        return self.search_batch(np.atleast_2d(query), k=k, threshold=threshold)[0]
+
+    def search_batch(
+        self, queries: np.ndarray, k: int = 5, threshold: float | None = None
+    ) -> List[List[Tuple[int, float]]]:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if queries.shape[1] != self.dimension:
+            raise ValueError(f"Query dimension {queries.shape[1]} does not match gallery dimension {self.dimension}")
+        if not len(self) or k <= 0:
+            return [[] for _ in range(queries.shape[0])]
+
+        storage, scales, ids = self._view()
+        queries = normalize_rows(queries)
+        index, indexed_rows = self._index, self._indexed_rows
+        if index is None:
+            scores = score_rows(queries, storage, scales)
+            return [self._top_k(row, ids, k, threshold) for row in scores]
+
+        window = k * max(self.max_rows_per_student, 1)
+        tail = np.arange(indexed_rows, len(ids))
+        results = []
+        for query in queries:
+            rows = np.concatenate([index.candidates(query, window), tail])
+            candidates = dequantize_rows(storage[rows], None if scales is None else scales[rows])
+            results.append(self._top_k(candidates @ query, ids[rows], k, threshold))
+        return results
+
+    def _top_k(
+        self, scores: np.ndarray, ids: np.ndarray, k: int, threshold: float | None
+    ) -> List[Tuple[int, float]]:
+        # A student in the true top-k has their best row within the first
+        # k * max_rows_per_student rows, so this window yields k distinct ids.
+        window = min(len(scores), k * max(self.max_rows_per_student, 1))
+        if window < len(scores):
+            rows = np.argpartition(scores, -window)[-window:]
+        else:
+            rows = np.arange(len(scores))
+        rows = rows[np.argsort(scores[rows])[::-1]]
+
+        matches: List[Tuple[int, float]] = []
+        seen: set[int] = set()
+        for row in rows:
+            score = float(scores[row])
+            if threshold is not None and score < threshold:
+                break
+            student_id = int(ids[row])
+            if student_id < 0 or student_id in seen:
+                continue  # tombstone, or a weaker row of a student already listed
+            seen.add(student_id)
+            matches.append((student_id, score))
+            if len(matches) == k:
+                break
+        return matches
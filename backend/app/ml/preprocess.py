@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import io
+
+import numpy as np
+
+# Pillow is imported lazily so the API (and predict-only models) still start
+# without it; only encoders that consume arrays need it.
+
+
+def _pillow():
+    try:
+        from PIL import Image, ImageOps
+    except ImportError as exc:  # pragma: no cover - depends on the environment
+        raise RuntimeError("Pillow is required for image pre-processing; install it or set input_format='bytes'") from exc
+    return Image, ImageOps
+
+
+def load_image(data: bytes | memoryview, max_side: int):
+    """Decode an image once, upright and in RGB, with its longest side at most `max_side`.
+
+    JPEGs are decoded in draft mode, letting libjpeg scale by 1/2, 1/4 or 1/8
+    while decoding instead of materialising every pixel of a 12 MP photo.
+    """
+    Image, ImageOps = _pillow()
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.draft("RGB", (max_side, max_side))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+    except (OSError, Image.DecompressionBombError) as exc:
+        raise ValueError("Unsupported or corrupt image") from exc
+    if max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.Resampling.BILINEAR)
+    return image
+
+
+def face_input(data: bytes | memoryview, size: int) -> np.ndarray:
+    """Fixed `(size, size, 3)` uint8 RGB array, letterboxed to keep the aspect ratio."""
+    Image, ImageOps = _pillow()
+    image = load_image(data, size)
+    return np.asarray(ImageOps.pad(image, (size, size), method=Image.Resampling.BILINEAR), dtype=np.uint8)
+
+
+def scene_input(data: bytes | memoryview, max_side: int) -> np.ndarray:
+    """`(height, width, 3)` uint8 RGB array of a whole photo, for face detection."""
+    return np.asarray(load_image(data, max_side), dtype=np.uint8)
+
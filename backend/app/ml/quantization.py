@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from typing import Any, Dict
+
+import numpy as np
+
+from app.ml.gallery import dequantize_rows, normalize_rows, quantize_rows, score_rows
+
+# Probe rows are gallery rows plus noise of this norm: roughly the spread between
+# two photos of the same face, so the probes exercise scores near the threshold.
+PROBE_NOISE = 0.6
+PROBE_CHUNK = 256
+
+
+def quantization_report(
+    embeddings: np.ndarray, dtype: str, threshold: float, sample: int = 256, seed: int = 0
+) -> Dict[str, Any]:
+    """Compare similarity scores of a gallery stored as `dtype` against float32.
+
+    Reports the memory saved, the score error, how many probe/row decisions flip
+    at `threshold` and how often the top-1 row still agrees.
+    """
+    rows = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+    storage, scales = quantize_rows(rows, dtype)
+    rng = np.random.default_rng(seed)
+    picked = rows[rng.choice(len(rows), size=min(sample, len(rows)), replace=False)]
+    noise = normalize_rows(rng.standard_normal(picked.shape).astype(np.float32)) * PROBE_NOISE
+    probes = normalize_rows(picked + noise)
+
+    max_error, error_sum, flipped, agree = 0.0, 0.0, 0, 0
+    for start in range(0, len(probes), PROBE_CHUNK):
+        chunk = probes[start : start + PROBE_CHUNK]
+        exact = chunk @ rows.T
+        approximate = score_rows(chunk, storage, scales)
+        error = np.abs(exact - approximate)
+        max_error = max(max_error, float(error.max(initial=0.0)))
+        error_sum += float(error.sum())
+        flipped += int(np.count_nonzero((exact >= threshold) != (approximate >= threshold)))
+        agree += int(np.count_nonzero(exact.argmax(axis=1) == approximate.argmax(axis=1)))
+
+    stored_bytes = storage.nbytes + (0 if scales is None else scales.nbytes)
+    comparisons = len(probes) * len(rows)
+    return {
+        "dtype": dtype,
+        "rows": len(rows),
+        "bytes": int(stored_bytes),
+        "float32_bytes": int(rows.nbytes),
+        "compression": round(rows.nbytes / stored_bytes, 2) if stored_bytes else 1.0,
+        "max_abs_score_error": round(max_error, 6),
+        "mean_abs_score_error": round(error_sum / comparisons, 6) if comparisons else 0.0,
+        "threshold": threshold,
+        "decisions_flipped": flipped,
+        "decisions": comparisons,
+        "top1_agreement": round(agree / len(probes), 4) if len(probes) else 1.0,
+        "reconstruction_error": round(float(np.abs(dequantize_rows(storage, scales) - rows).max(initial=0.0)), 6),
+    }
@@ -1,13 +1,21 @@
 from __future__ import annotations
 
 import base64
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Any, Collection, Dict, List, Optional, Sequence, Tuple
 
+import numpy as np
 from loguru import logger
 
 from app.config import settings
-from app.schemas import IdentifyResult
+from app.ml import ann, artifacts, preprocess
+from app.ml.gallery import EmbeddingGallery
+from app.schemas import IdentifyCandidate, IdentifyResult
+from app.utils.cache import TTLCache
 
 
 class ModelNotLoadedError(RuntimeError):
@@ -22,29 +30,298 @@ class DummyModel:
         return IdentifyResult(matched=False, student_id=None, confidence=0.0, payload=None)
 
 
+@dataclass(frozen=True)
+class IdentifyJob:
+    image_bytes: bytes
+    course_id: int | None = None
+    candidate_ids: Optional[frozenset[int]] = None
+
+    @property
+    def scope(self) -> tuple[int | None, Optional[frozenset[int]]]:
+        return self.course_id, self.candidate_ids
+
+
 class FaceRecognitionService:
-    def __init__(self, model_path: Path, threshold: float = 0.65):
+    def __init__(
+        self,
+        model_path: Path,
+        threshold: float = 0.65,
+        top_k: int = 5,
+        input_size: int = 160,
+        scene_max_side: int = 1600,
+        mmap: bool = True,
+        ann_config: ann.AnnConfig | None = None,
+        gallery_dtype: str = "float32",
+        partition_cache_size: int = 64,
+        partition_cache_ttl: float = 600.0,
+    ):
         self.model_path = model_path
         self.threshold = threshold
-        self.model = self._load_model(model_path)
+        self.top_k = top_k
+        self.input_size = input_size
+        self.scene_max_side = scene_max_side
+        self.mmap = mmap
+        self.ann_config = ann_config or ann.AnnConfig()
+        self.gallery_dtype = gallery_dtype
+        self.version = artifacts.fingerprint(model_path)
+        self.model, self.gallery = self._unpack_artifact(self._load_model(model_path))
+        # Course slices are copies of their rows, so only recently used rosters are kept.
+        self._partitions: TTLCache[Tuple[int, frozenset[int]], EmbeddingGallery] = TTLCache(
+            maxsize=partition_cache_size, ttl=partition_cache_ttl
+        )
+        self._partitions_lock = threading.Lock()
+        self._journal_position = artifacts.JournalPosition()
+        self._gallery_generation = 0
+        self._journal_lock = threading.Lock()
+        self.sync_enrollments()
 
     def _load_model(self, model_path: Path):
         if model_path.exists():
             try:
                 import joblib
 
-                logger.info("Loading face model from %s", model_path)
-                return joblib.load(model_path)
+                logger.info("Loading face model from {}", model_path)
+                # Uncompressed numpy arrays inside the dump are memory-mapped instead of copied.
+                return joblib.load(model_path, mmap_mode="r" if self.mmap else None)
             except Exception as exc:  # pragma: no cover - depends on custom artifact
-                logger.error("Failed to load face model: %s", exc)
+                logger.error("Failed to load face model: {}", exc)
                 raise ModelNotLoadedError("Unable to load provided face model") from exc
-        logger.warning("Face model not found at %s; using dummy recognizer", model_path)
+        logger.warning("Face model not found at {}; using dummy recognizer", model_path)
         return DummyModel()
 
-    def identify(self, image_bytes: bytes) -> IdentifyResult:
+    def _unpack_artifact(self, artifact) -> tuple[object, Optional[EmbeddingGallery]]:
+        # Embedding artifacts ship an encoder plus the enrolled gallery, either as a
+        # `{"encoder", "embeddings", "student_ids"}` bundle or as attributes on the encoder.
+        if isinstance(artifact, dict) and "encoder" in artifact:
+            encoder = artifact["encoder"]
+            embeddings, student_ids = artifact.get("embeddings"), artifact.get("student_ids")
+        else:
+            encoder = artifact
+            embeddings, student_ids = getattr(artifact, "embeddings", None), getattr(artifact, "student_ids", None)
+
+        sidecars = artifacts.load_sidecars(self.model_path, mmap=self.mmap)
+        if sidecars is not None:
+            embeddings, student_ids = sidecars.embeddings, sidecars.student_ids
+        if embeddings is None or student_ids is None or not hasattr(encoder, "embed"):
+            return encoder, None
+        gallery = self._build_gallery(embeddings, student_ids, sidecars)
+        # Built over the artifact's rows, before journal replay appends enrolments after them.
+        index = ann.load_or_build(self.model_path, gallery, self.ann_config, self.version)
+        if index is not None:
+            gallery.attach_index(index)
+        return encoder, gallery
+
+    def _build_gallery(self, embeddings, student_ids, sidecars: Optional[artifacts.Sidecars]) -> EmbeddingGallery:
+        normalized, dtype, scales = False, self.gallery_dtype, None
+        if sidecars is not None:
+            normalized, scales = True, sidecars.scales
+            if sidecars.dtype != "float32":
+                dtype = sidecars.dtype  # already quantised on disk (`artifacts quantize`); map as stored
+        gallery = EmbeddingGallery(embeddings, student_ids, normalized=normalized, dtype=dtype, scales=scales)
+        logger.info(
+            "Loaded face gallery with {} {} embeddings ({} bytes) for matrix search{}",
+            len(gallery),
+            gallery.dtype,
+            gallery.nbytes,
+            " (memory-mapped)" if sidecars is not None and self.mmap else "",
+        )
+        return gallery
+
+    @property
+    def supports_enrollment(self) -> bool:
+        return hasattr(self.model, "embed")
+
+    def embed_enrollment(self, images: Sequence[bytes]) -> np.ndarray:
+        """One embedding per enrolment photo, as a `(len(images), dim)` matrix."""
+        if not self.supports_enrollment:
+            raise ValueError("The loaded face model does not support photo enrollment")
+        if not images or not all(images):
+            raise ValueError("Enrollment photos are missing")
+        return np.stack([np.asarray(self.model.embed(self._face_input(image)), dtype=np.float32) for image in images])
+
+    def sync_enrollments(self) -> None:
+        """Apply enrolment changes appended to the journal since the last call (one `stat` when idle)."""
+        if not self.supports_enrollment:
+            return
+        with self._journal_lock:
+            previous = self._journal_position
+            entries, self._journal_position = artifacts.read_journal(self.model_path, previous)
+            position = self._journal_position
+            if previous.inode and (position.generation, position.inode) != (previous.generation, previous.inode):
+                self._reload_compacted_gallery()
+                changed = None
+            elif entries:
+                self.gallery = artifacts.apply_journal(self.gallery, entries, dtype=self.gallery_dtype)
+                changed = {entry["student_id"] for entry in entries}
+            else:
+                return
+        with self._partitions_lock:
+            self._gallery_generation += 1
+            self._partitions.invalidate(lambda key: changed is None or bool(key[1] & changed))
+
+    def _reload_compacted_gallery(self) -> None:
+        """Rebuild the gallery from sidecars rewritten by `compact`, then replay the new journal.
+
+        Entries appended after this process last synced were folded into those
+        sidecars, so replaying the new (shorter) journal alone would miss them.
+        The journal lock keeps another compaction from swapping files mid-read.
+        The ANN index is not rebuilt here; it is refreshed on the next model
+        reload, which the artifact watcher triggers for the changed sidecars.
+        """
+        with artifacts.journal_lock(self.model_path):
+            sidecars = artifacts.load_sidecars(self.model_path, mmap=self.mmap)
+            entries, self._journal_position = artifacts.read_journal(self.model_path)
+        gallery = None if sidecars is None else self._build_gallery(sidecars.embeddings, sidecars.student_ids, sidecars)
+        self.gallery = artifacts.apply_journal(gallery, entries, dtype=self.gallery_dtype)
+
+    def partition(self, course_id: int, student_ids: Collection[int]) -> EmbeddingGallery:
+        """Gallery slice for one course, rebuilt only when its enrolment changes."""
+        key = (course_id, frozenset(student_ids))
+        with self._partitions_lock:
+            cached = self._partitions.get(key)
+            if cached is not None:
+                return cached
+            generation = self._gallery_generation
+        partition = self.gallery.subset(key[1])
+        with self._partitions_lock:
+            if generation == self._gallery_generation:  # skip caching a slice of a gallery changed meanwhile
+                self._partitions.invalidate(lambda cached_key: cached_key[0] == course_id)  # superseded roster
+                self._partitions.set(key, partition)
+        return partition
+
+    def identify(
+        self,
+        image_bytes: bytes,
+        course_id: int | None = None,
+        candidate_ids: Collection[int] | None = None,
+    ) -> IdentifyResult:
+        """Identify a face, optionally restricted to `candidate_ids` (e.g. a course roster)."""
         if not image_bytes:
             raise ValueError("Image payload is empty")
 
+        self.sync_enrollments()
+        if self.gallery is not None:
+            gallery = self._scoped_gallery(course_id, candidate_ids)
+            return self._match(gallery, self.model.embed(self._face_input(image_bytes)))
+
+        result = self._predict(image_bytes)
+        if candidate_ids is not None and result.matched and result.student_id not in candidate_ids:
+            # Opaque models search everyone; drop matches outside the allowed roster.
+            return IdentifyResult(matched=False, student_id=None, confidence=result.confidence, payload=result.payload)
+        return result
+
+    def identify_batch(self, jobs: Sequence[IdentifyJob]) -> List[IdentifyResult | Exception]:
+        """Identify several frames at once; failures are returned in place of results."""
+        self.sync_enrollments()
+        results: List[IdentifyResult | Exception] = [ValueError("Image payload is empty")] * len(jobs)
+        pending = [idx for idx, job in enumerate(jobs) if job.image_bytes]
+
+        if self.gallery is None:
+            for idx in pending:
+                job = jobs[idx]
+                results[idx] = self._guard(self.identify, job.image_bytes, job.course_id, job.candidate_ids)
+            return results
+
+        embeddings = self._embed_batch([jobs[idx].image_bytes for idx in pending], pending, results)
+        by_scope: Dict[tuple, List[int]] = {}
+        for idx in embeddings:
+            by_scope.setdefault(jobs[idx].scope, []).append(idx)
+
+        # One matrix-matrix product per roster instead of one search per frame.
+        for (course_id, candidate_ids), indexes in by_scope.items():
+            gallery = self._scoped_gallery(course_id, candidate_ids)
+            ranked = gallery.search_batch(np.stack([embeddings[idx] for idx in indexes]), k=self.top_k)
+            for idx, matches in zip(indexes, ranked):
+                results[idx] = self._to_result(matches)
+        return results
+
+    def _embed_batch(
+        self, images: List[bytes], indexes: List[int], results: List[IdentifyResult | Exception]
+    ) -> Dict[int, np.ndarray]:
+        inputs: Dict[int, object] = {}
+        for idx, image_bytes in zip(indexes, images):
+            prepared = self._guard(self._face_input, image_bytes)
+            if isinstance(prepared, Exception):
+                results[idx] = prepared
+            else:
+                inputs[idx] = prepared
+
+        if inputs and hasattr(self.model, "embed_batch"):
+            batch = list(inputs.values())
+            try:
+                # Pre-processed frames share one shape, so they stack into a single (n, h, w, 3) tensor.
+                stacked = np.stack(batch) if isinstance(batch[0], np.ndarray) else batch
+                return dict(zip(inputs, np.asarray(self.model.embed_batch(stacked), dtype=np.float32)))
+            except Exception as exc:
+                logger.warning("Batched embedding failed, retrying frames one by one: {}", exc)
+
+        embeddings: Dict[int, np.ndarray] = {}
+        for idx, prepared in inputs.items():
+            embedding = self._guard(self.model.embed, prepared)
+            if isinstance(embedding, Exception):
+                results[idx] = embedding
+            else:
+                embeddings[idx] = embedding
+        return embeddings
+
+    @staticmethod
+    def _guard(func, *args):
+        try:
+            return func(*args)
+        except Exception as exc:
+            return exc
+
+    def identify_group(
+        self,
+        image_bytes: bytes,
+        course_id: int | None = None,
+        candidate_ids: Collection[int] | None = None,
+    ) -> List[IdentifyResult]:
+        """Identify every face in a group photo; each student is matched at most once."""
+        if not image_bytes:
+            raise ValueError("Image payload is empty")
+        self.sync_enrollments()
+        if self.gallery is None or not hasattr(self.model, "embed_faces"):
+            return [self.identify(image_bytes, course_id=course_id, candidate_ids=candidate_ids)]
+
+        faces = np.asarray(self.model.embed_faces(self._scene_input(image_bytes)), dtype=np.float32)
+        if faces.size == 0:
+            return []
+        gallery = self._scoped_gallery(course_id, candidate_ids)
+        ranked = gallery.search_batch(faces, k=self.top_k)
+
+        def best_score(face: int) -> float:
+            return ranked[face][0][1] if ranked[face] else 0.0
+
+        # Greedy assignment, most confident face first, so two faces never claim one student.
+        results: List[IdentifyResult] = [None] * len(ranked)  # type: ignore[list-item]
+        claimed: set[int] = set()
+        for face in sorted(range(len(ranked)), key=best_score, reverse=True):
+            available = [match for match in ranked[face] if match[0] not in claimed]
+            result = self._to_result(available, fallback_score=best_score(face))
+            if result.matched:
+                claimed.add(result.student_id)
+            results[face] = result
+        return results
+
+    def _wants_bytes(self) -> bool:
+        return getattr(self.model, "input_format", "array") == "bytes"
+
+    def _face_input(self, image_bytes: bytes):
+        """Encoder input for one face: a fixed-size RGB array unless the encoder decodes bytes itself."""
+        return image_bytes if self._wants_bytes() else preprocess.face_input(image_bytes, self.input_size)
+
+    def _scene_input(self, image_bytes: bytes):
+        return image_bytes if self._wants_bytes() else preprocess.scene_input(image_bytes, self.scene_max_side)
+
+    def _scoped_gallery(self, course_id: int | None, candidate_ids: Collection[int] | None) -> EmbeddingGallery:
+        if candidate_ids is None:
+            return self.gallery
+        if course_id is not None:
+            return self.partition(course_id, candidate_ids)
+        return self.gallery.subset(candidate_ids)
+
+    def _predict(self, image_bytes: bytes) -> IdentifyResult:
         # The actual model is expected to expose a `.predict` API returning
         # `{matched: bool, student_id: Optional[int], confidence: float, payload: Optional[str]}`.
         raw_result = self.model.predict(image_bytes)
@@ -67,6 +344,27 @@ class FaceRecognitionService:
         student_id = raw_result[1] if matched else None
         return IdentifyResult(matched=matched, student_id=student_id, confidence=confidence)
 
+    def _match(self, gallery: EmbeddingGallery, embedding: np.ndarray) -> IdentifyResult:
+        return self._to_result(gallery.search(embedding, k=self.top_k))
+
+    def _to_result(self, ranked: List[Tuple[int, float]], fallback_score: float = 0.0) -> IdentifyResult:
+        if not ranked:
+            return IdentifyResult(matched=False, student_id=None, confidence=max(fallback_score, 0.0))
+
+        best_id, best_score = ranked[0]
+        matched = best_score >= self.threshold
+        candidates = [
+            IdentifyCandidate(student_id=student_id, confidence=score)
+            for student_id, score in ranked
+            if score >= self.threshold
+        ]
+        return IdentifyResult(
+            matched=matched,
+            student_id=best_id if matched else None,
+            confidence=max(best_score, 0.0),
+            candidates=candidates,
+        )
+
 
 def decode_base64_image(value: str | None) -> Optional[bytes]:
     if not value:
@@ -76,4 +374,104 @@ def decode_base64_image(value: str | None) -> Optional[bytes]:
     return base64.b64decode(payload)
 
 
-recognizer = FaceRecognitionService(settings.face_model_path, threshold=settings.face_match_threshold)
+# The shared recognizer is built on a background thread instead of at import
+# time, so processes that only serve CRUD never pay for `joblib.load`.
+_load_lock = threading.Lock()
+_load_future: Optional[Future] = None
+_load_timing: Dict[str, float] = {}
+
+
+def _build_recognizer() -> FaceRecognitionService:
+    return FaceRecognitionService(
+        settings.face_model_path,
+        threshold=settings.face_match_threshold,
+        top_k=settings.face_top_k,
+        input_size=settings.face_input_size,
+        scene_max_side=settings.face_scene_max_side,
+        mmap=settings.face_model_mmap,
+        ann_config=ann.AnnConfig(
+            backend=settings.face_ann_backend,
+            min_rows=settings.face_ann_min_rows,
+            nlist=settings.face_ann_nlist,
+            nprobe=settings.face_ann_nprobe,
+            ef_search=settings.face_ann_ef_search,
+        ),
+        gallery_dtype=settings.face_gallery_dtype,
+        partition_cache_size=settings.face_partition_cache_max_entries,
+        partition_cache_ttl=settings.face_partition_cache_ttl_seconds,
+    )
+
+
+def _load_into(future: Future) -> None:
+    started = time.perf_counter()
+    try:
+        service = _build_recognizer()
+    except BaseException as exc:
+        logger.error("Face model load failed: {}", exc)
+        future.set_exception(exc)
+    else:
+        future.set_result(service)
+    finally:
+        _load_timing["seconds"] = time.perf_counter() - started
+
+
+def load_recognizer() -> Future:
+    """Start loading the shared recognizer (once) and return a future resolving to it.
+
+    A failed load is retried on the next call; `reload_recognizer` replaces a loaded one.
+    """
+    global _load_future
+    with _load_lock:
+        if _load_future is None or (_load_future.done() and _load_future.exception() is not None):
+            _load_future = Future()
+            _load_future.set_running_or_notify_cancel()
+            threading.Thread(target=_load_into, args=(_load_future,), name="face-model-loader", daemon=True).start()
+        return _load_future
+
+
+def reload_recognizer() -> FaceRecognitionService:
+    """Load the artifact again and swap the new recognizer in; blocks while loading.
+
+    Calls that already hold the previous instance finish on it. If the load
+    fails the exception propagates and the previous recognizer stays in place.
+    """
+    global _load_future
+    started = time.perf_counter()
+    service = _build_recognizer()
+    _load_timing["seconds"] = time.perf_counter() - started
+    loaded: Future = Future()
+    loaded.set_running_or_notify_cancel()
+    loaded.set_result(service)
+    with _load_lock:
+        _load_future = loaded
+    logger.info("Face model reloaded (version {})", service.version)
+    return service
+
+
+def loaded_recognizer() -> Optional[FaceRecognitionService]:
+    """The shared recognizer if this process has already loaded it, without starting a load."""
+    future = _load_future
+    if future is None or not future.done() or future.exception() is not None:
+        return None
+    return future.result()
+
+
+def get_recognizer(timeout: float | None = None) -> FaceRecognitionService:
+    """The shared recognizer, blocking until it has loaded."""
+    return load_recognizer().result(timeout)
+
+
+def recognizer_status() -> Dict[str, Any]:
+    future = _load_future
+    if future is None:
+        return {"state": "not_loaded"}
+    if not future.done():
+        return {"state": "loading"}
+    status: Dict[str, Any] = {"load_seconds": round(_load_timing.get("seconds", 0.0), 3)}
+    if future.exception() is not None:
+        return {"state": "failed", "error": str(future.exception()), **status}
+    service = future.result()
+    if service.gallery is not None:
+        gallery = service.gallery
+        status["gallery"] = {"rows": len(gallery), "dtype": gallery.dtype, "bytes": gallery.nbytes}
+    return {"state": "ready", "model": type(service.model).__name__, "version": service.version, **status}
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Dict, Optional, Tuple
+
+from app.schemas import IdentifyResult
+from app.utils.cache import TTLCache
+
+Scope = Tuple[Optional[int], Optional[frozenset]]
+
+
+def content_key(data: bytes | memoryview) -> bytes:
+    """SHA-256 digest of an uploaded frame, used as its cache key."""
+    return hashlib.sha256(data).digest()
+
+
+class RecognitionCache:
+    """Recent identification results keyed by (roster scope, frame content hash).
+
+    Only byte-identical frames share a result, so retried uploads skip inference
+    while a different photo, however similar, is always identified afresh.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0):
+        self._entries: TTLCache[Tuple[Scope, bytes], IdentifyResult] = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @property
+    def enabled(self) -> bool:
+        return self._entries.maxsize > 0 and self._entries.ttl > 0
+
+    def get(self, scope: Scope, key: bytes) -> Optional[IdentifyResult]:
+        return self._entries.get((scope, key))
+
+    def set(self, scope: Scope, key: bytes, result: IdentifyResult) -> None:
+        self._entries.set((scope, key), result)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        return self._entries.stats()
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Collection, List, Sequence
+
+from loguru import logger
+
+from app.schemas import IdentifyResult
+
+# Functions below run inside pool workers. Each worker loads the recognizer
+# once in its initializer, so the artifact is loaded a single time per
+# process and image bytes/results are the only data crossing the IPC queues.
+
+
+def _init_worker(loaded) -> None:
+    from app.ml.recognizer import get_recognizer
+
+    logger.info("Recognition worker ready with {}", type(get_recognizer().model).__name__)
+    # No worker takes a task until every worker has loaded the model, so once
+    # any warm-up ping returns the whole pool is ready.
+    loaded.wait()
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def identify_batch(jobs: Sequence) -> List[IdentifyResult | Exception]:
+    from app.ml.recognizer import get_recognizer
+
+    return get_recognizer().identify_batch(jobs)
+
+
+def identify_group(
+    image_bytes: bytes, course_id: int | None = None, candidate_ids: Collection[int] | None = None
+) -> List[IdentifyResult]:
+    from app.ml.recognizer import get_recognizer
+
+    return get_recognizer().identify_group(image_bytes, course_id=course_id, candidate_ids=candidate_ids)
+
+
+def embed_enrollment(images: Sequence[bytes]):
+    from app.ml.recognizer import get_recognizer
+
+    return get_recognizer().embed_enrollment(images)
+
+
+def create_recognition_pool(workers: int) -> ProcessPoolExecutor | None:
+    """Process pool with preloaded recognizers, or `None` to recognise in-process."""
+    if workers <= 0:
+        return None
+    # Spawn rather than fork: the API process already runs threads (event loop, thread pool).
+    context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(context.Barrier(workers),)
+    )
+
+
+def warm_up(pool: ProcessPoolExecutor, workers: int) -> Future:
+    """Start every worker now; the returned future resolves once all of them have loaded the model.
+
+    Workers are spawned on demand, one per queued task, so `workers` pings start
+    all of them; the initializer barrier keeps any ping from finishing earlier.
+    """
+    ready: Future = Future()
+    ready.set_running_or_notify_cancel()
+    pending = [workers]
+    lock = threading.Lock()
+
+    def on_ping(ping: Future) -> None:
+        with lock:
+            if ready.done():
+                return
+            if ping.exception() is not None:
+                ready.set_exception(ping.exception())
+                return
+            pending[0] -= 1
+            if pending[0] == 0:
+                ready.set_result(True)
+
+    for _ in range(workers):
+        pool.submit(_ping).add_done_callback(on_ping)
+    return ready
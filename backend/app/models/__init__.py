@@ -1,9 +1,10 @@
-from .attendance import AttendanceRecord, AttendanceSession, AttendanceStatus
+from .attendance import AttendanceDailyRollup, AttendanceRecord, AttendanceSession, AttendanceStatus
 from .course import Course, Enrollment
 from .student import Student
 from .teacher import Teacher
 
 __all__ = [
+    "AttendanceDailyRollup",
     "AttendanceRecord",
     "AttendanceSession",
     "AttendanceStatus",
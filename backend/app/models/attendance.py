@@ -3,7 +3,20 @@ from __future__ import annotations
 from datetime import date, datetime
 from enum import Enum as PyEnum
 
-from sqlalchemy import Date, DateTime, Enum as SAEnum, ForeignKey, Numeric, String, Text
+from sqlalchemy import (
+    Boolean,
+    Date,
+    DateTime,
+    Enum as SAEnum,
+    ForeignKey,
+    Index,
+    Integer,
+    Numeric,
+    String,
+    Text,
+    UniqueConstraint,
+    text,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db import Base
@@ -18,12 +31,25 @@ class AttendanceStatus(str, PyEnum):
 
 class AttendanceSession(TimestampMixin, Base):
     __tablename__ = "attendance_sessions"
+    __table_args__ = (
+        Index("ix_attendance_sessions_course_date", "course_id", "session_date"),
+        # At most one scan-opened session per course and day, so concurrent first scans converge on it.
+        Index(
+            "uq_attendance_sessions_scan",
+            "course_id",
+            "session_date",
+            unique=True,
+            postgresql_where=text("opened_by_scan"),
+            sqlite_where=text("opened_by_scan"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     course_id: Mapped[int] = mapped_column(ForeignKey("courses.id", ondelete="CASCADE"))
     session_date: Mapped[date] = mapped_column(Date, default=date.today, nullable=False)
     started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     notes: Mapped[str | None] = mapped_column(Text, nullable=True)
+    opened_by_scan: Mapped[bool] = mapped_column(Boolean, default=False, server_default=text("false"), nullable=False)
 
     course = relationship("Course", back_populates="sessions")
     records = relationship("AttendanceRecord", back_populates="session", cascade="all, delete-orphan")
@@ -31,6 +57,11 @@ class AttendanceSession(TimestampMixin, Base):
 
 class AttendanceRecord(TimestampMixin, Base):
     __tablename__ = "attendance_records"
+    __table_args__ = (
+        # Also serves lookups by session; records without a student (unknown faces) never conflict.
+        UniqueConstraint("session_id", "student_id", name="uq_attendance_session_student"),
+        Index("ix_attendance_records_student_created", "student_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     session_id: Mapped[int] = mapped_column(ForeignKey("attendance_sessions.id", ondelete="CASCADE"))
@@ -42,3 +73,21 @@ class AttendanceRecord(TimestampMixin, Base):
 
     session = relationship("AttendanceSession", back_populates="records")
     student = relationship("Student", back_populates="attendance_records")
+
+
+class AttendanceDailyRollup(Base):
+    """Record counts per course, day and student, kept in step with `attendance_records`.
+
+    Maintained incrementally by `rollup_service` in the same transaction as the
+    records; `python -m database.rollups` backfills and verifies it.
+    """
+
+    __tablename__ = "attendance_daily_rollups"
+    __table_args__ = (Index("ix_attendance_daily_rollups_student_date", "student_id", "session_date"),)
+
+    course_id: Mapped[int] = mapped_column(ForeignKey("courses.id", ondelete="CASCADE"), primary_key=True)
+    session_date: Mapped[date] = mapped_column(Date, primary_key=True)
+    student_id: Mapped[int] = mapped_column(ForeignKey("students.id", ondelete="CASCADE"), primary_key=True)
+    present: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    absent: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    unknown: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+from datetime import date
 from typing import List
 
-from fastapi import APIRouter, Depends, File, UploadFile
+from fastapi import APIRouter, Depends, File, Header, Response, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db import get_session
+from app.db import get_async_session
+from app.models import AttendanceRecord, AttendanceSession
 from app.schemas import (
     AttendanceRecordCreate,
     AttendanceRecordOut,
@@ -13,95 +16,150 @@ from app.schemas import (
     AttendanceSessionCreate,
     AttendanceSessionOut,
     AttendanceSessionUpdate,
+    AttendanceTrendOut,
+    GroupAttendanceOut,
     IdentifyRequest,
     MarkFaceAttendanceRequest,
 )
-from app.services import attendance_service
-from app.services.ml_integration import identify_from_inputs
-from app.utils.dependencies import get_current_teacher
+from app.services import attendance_service, course_service
+from app.services.ml_integration import identify_group_image, identify_image, read_image_input
+from app.utils.dependencies import get_current_teacher_async
 from app.utils.file_storage import save_snapshot
+from app.utils.pagination import PageParams, keyset_paginate, page_params
+from app.utils.streaming import OutputFormat, output_format, rows_response
 
 router = APIRouter(prefix="/attendance", tags=["attendance"])
 
+# Handlers are native coroutines on an AsyncSession; the synchronous service
+# functions run through `AsyncSession.run_sync`, which drives them over the
+# async driver instead of occupying a threadpool worker.
+
 
 @router.get("/sessions", response_model=List[AttendanceSessionOut])
-def list_sessions(
+async def list_sessions(
+    response: Response,
     course_id: int | None = None,
-    db: Session = Depends(get_session),
-    current_user=Depends(get_current_teacher),
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_teacher_async),
+    page: PageParams = Depends(page_params(default_size=200, max_size=1000)),
 ):
-    query = attendance_service.list_sessions(db, course_id)
-    return query.all()
+    def fetch_page(sync_db: Session):
+        query = attendance_service.list_sessions(sync_db, course_id)
+        return keyset_paginate(query, AttendanceSession.id, page, response, descending=True)
+
+    return await db.run_sync(fetch_page)
 
 
 @router.post("/sessions", response_model=AttendanceSessionOut, status_code=201)
-def create_session(
+async def create_session(
     payload: AttendanceSessionCreate,
-    db: Session = Depends(get_session),
-    current_user=Depends(get_current_teacher),
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_teacher_async),
 ):
-    return attendance_service.create_session(db, payload)
+    return await db.run_sync(attendance_service.create_session, payload)
 
 
 @router.put("/sessions/{session_id}", response_model=AttendanceSessionOut)
-def update_session(
+async def update_session(
     session_id: int,
     payload: AttendanceSessionUpdate,
-    db: Session = Depends(get_session),
-    current_user=Depends(get_current_teacher),
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_teacher_async),
 ):
-    return attendance_service.update_session(db, session_id, payload)
+    return await db.run_sync(attendance_service.update_session, session_id, payload)
 
 
 @router.delete("/sessions/{session_id}", status_code=204)
-def delete_session(session_id: int, db: Session = Depends(get_session), current_user=Depends(get_current_teacher)):
-    attendance_service.delete_session(db, session_id)
+async def delete_session(
+    session_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_teacher_async),
+):
+    await db.run_sync(attendance_service.delete_session, session_id)
     return None
 
 
 @router.get("/records", response_model=List[AttendanceRecordOut])
-def list_records(
+async def list_records(
+    response: Response,
     session_id: int | None = None,
-    db: Session = Depends(get_session),
-    current_user=Depends(get_current_teacher),
+    student_id: int | None = None,
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_teacher_async),
+    page: PageParams = Depends(page_params(default_size=200, max_size=1000)),
 ):
-    query = attendance_service.list_records(db, session_id)
-    return query.all()
+    def fetch_page(sync_db: Session):
+        query = attendance_service.list_records(sync_db, session_id, student_id)
+        return keyset_paginate(query, AttendanceRecord.id, page, response, descending=True)
+
+    return await db.run_sync(fetch_page)
 
 
 @router.post("/records", response_model=AttendanceRecordOut, status_code=201)
-def create_record(
+async def create_record(
     payload: AttendanceRecordCreate,
-    db: Session = Depends(get_session),
-    current_user=Depends(get_current_teacher),
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_teacher_async),
+):
+    return await db.run_sync(attendance_service.create_record, payload)
+
+
+@router.post("/records/bulk", response_model=List[AttendanceRecordOut], status_code=201)
+async def create_records_bulk(
+    payload: List[AttendanceRecordCreate],
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_teacher_async),
 ):
-    return attendance_service.create_record(db, payload)
+    return await db.run_sync(attendance_service.create_records_bulk, payload)
 
 
 @router.put("/records/{record_id}", response_model=AttendanceRecordOut)
-def update_record(
+async def update_record(
     record_id: int,
     payload: AttendanceRecordUpdate,
-    db: Session = Depends(get_session),
-    current_user=Depends(get_current_teacher),
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_teacher_async),
+):
+    return await db.run_sync(attendance_service.update_record, record_id, payload)
+
+
+@router.get("/trend", response_model=List[AttendanceTrendOut])
+async def attendance_trend(
+    course_id: int | None = None,
+    department: str | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    format: OutputFormat = Depends(output_format),
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_teacher_async),
 ):
-    return attendance_service.update_record(db, record_id, payload)
+    """Daily present/absent/unknown totals for a course, a department or everything, from the daily rollup."""
+    statement = attendance_service.attendance_trend(course_id, department, date_from, date_to)
+    return await rows_response(db, statement, attendance_service.trend_row, format)
 
 
 @router.post("/mark-face", response_model=AttendanceRecordOut)
 async def mark_face_attendance(
     payload: MarkFaceAttendanceRequest = Depends(MarkFaceAttendanceRequest.as_form),
     image_file: UploadFile | None = File(None),
-    db: Session = Depends(get_session),
-    current_user=Depends(get_current_teacher),
+    idempotency_key: str | None = Header(None, max_length=255, description="Replays the first response on retries"),
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_teacher_async),
 ):
-    identify_request = IdentifyRequest(image_base64=payload.image_base64)
-    identification = await identify_from_inputs(identify_request, image_file)
-    snapshot_url = None
-    if image_file is not None:
-        snapshot_url = save_snapshot(payload.course_id, image_file, payload.session_id)
-    record = attendance_service.mark_face_attendance(
-        db=db,
+    if idempotency_key:
+        replay = await db.run_sync(
+            attendance_service.replay_face_mark, current_user.id, idempotency_key, payload.course_id
+        )
+        if replay is not None:
+            return replay
+    image = await read_image_input(IdentifyRequest(image_base64=payload.image_base64), image_file)
+    # Only students enrolled in the course can be in the room; an empty roster
+    # means enrolments are not managed for this course, so search everyone.
+    enrolled_ids = (await db.run_sync(course_service.list_enrolled_student_ids, payload.course_id)) or None
+    identification = await identify_image(image, course_id=payload.course_id, candidate_ids=enrolled_ids)
+    snapshot_url = await save_snapshot(image.view, image.suffix)
+    record = await db.run_sync(
+        attendance_service.mark_face_attendance,
         course_id=payload.course_id,
         student_id=identification.student_id if identification.matched else None,
         confidence=identification.confidence,
@@ -109,4 +167,37 @@ async def mark_face_attendance(
         notes=payload.notes,
         snapshot_url=snapshot_url,
     )
+    if idempotency_key:
+        attendance_service.remember_face_mark(current_user.id, idempotency_key, payload.course_id, record)
     return record
+
+
+@router.post("/mark-group", response_model=GroupAttendanceOut)
+async def mark_group_attendance(
+    payload: MarkFaceAttendanceRequest = Depends(MarkFaceAttendanceRequest.as_form),
+    image_file: UploadFile | None = File(None),
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_teacher_async),
+):
+    """Mark a whole class from one classroom photo (legacy `/mark-attendance` flow)."""
+    image = await read_image_input(IdentifyRequest(image_base64=payload.image_base64), image_file)
+    enrolled_ids = (await db.run_sync(course_service.list_enrolled_student_ids, payload.course_id)) or None
+    matches = await identify_group_image(image, course_id=payload.course_id, candidate_ids=enrolled_ids)
+    snapshot_url = await save_snapshot(image.view, image.suffix)
+    session, records = await db.run_sync(
+        attendance_service.mark_group_attendance,
+        course_id=payload.course_id,
+        matches=matches,
+        session_id=payload.session_id,
+        notes=payload.notes,
+        snapshot_url=snapshot_url,
+    )
+    recognized = [match.student_id for match in matches if match.matched]
+    return GroupAttendanceOut(
+        session_id=session.id,
+        faces_detected=len(matches),
+        recognized_students=list(dict.fromkeys(recognized)),
+        unrecognized_faces=len(matches) - len(recognized),
+        snapshot_url=snapshot_url,
+        records=records,
+    )
@@ -1,27 +1,32 @@
 from __future__ import annotations
 
+from datetime import date
 from typing import List
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db import get_session
-from app.schemas import CourseCreate, CourseOut, CourseUpdate
-from app.services import course_service
-from app.utils.dependencies import get_current_teacher
+from app.db import get_async_session, get_session
+from app.models import Course
+from app.schemas import AttendanceSummaryOut, CourseCreate, CourseOut, CourseUpdate
+from app.services import attendance_service, course_service
+from app.utils.dependencies import get_current_teacher, get_current_teacher_async
+from app.utils.pagination import PageParams, keyset_paginate, page_params
+from app.utils.streaming import OutputFormat, output_format, rows_response
 
 router = APIRouter(prefix="/courses", tags=["courses"])
 
 
 @router.get("/", response_model=List[CourseOut])
 def list_courses(
+    response: Response,
     db: Session = Depends(get_session),
     current_user=Depends(get_current_teacher),
-    page: int = Query(1, ge=1),
-    page_size: int = Query(50, ge=1, le=200),
+    page: PageParams = Depends(page_params()),
 ):
     query = course_service.list_courses(db)
-    return query.offset((page - 1) * page_size).limit(page_size).all()
+    return keyset_paginate(query, Course.id, page, response)
 
 
 @router.post("/", response_model=CourseOut, status_code=201)
@@ -38,6 +43,21 @@ def get_course(course_id: int, db: Session = Depends(get_session), current_user=
     return course_service.get_course_or_404(db, course_id)
 
 
+@router.get("/{course_id}/attendance-summary", response_model=List[AttendanceSummaryOut])
+async def course_attendance_summary(
+    course_id: int,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    format: OutputFormat = Depends(output_format),
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_teacher_async),
+):
+    """Per-student present/absent/unknown counts and rates over the course's sessions in the date range."""
+    await db.run_sync(attendance_service.ensure_course, course_id)
+    statement = attendance_service.attendance_summary(course_id=course_id, date_from=date_from, date_to=date_to)
+    return await rows_response(db, statement, attendance_service.summary_row, format)
+
+
 @router.put("/{course_id}", response_model=CourseOut)
 def update_course(
     course_id: int,
@@ -1,7 +1,14 @@
 from __future__ import annotations
 
+from typing import Any, Dict
+
 from fastapi import APIRouter
 
+from app.db import pool_status
+from app.services.attendance_service import face_mark_keys
+from app.services.auth_service import principal_cache
+from app.services.ml_integration import model_status, result_cache
+
 router = APIRouter(tags=["health"], prefix="/health")
 
 
@@ -11,5 +18,16 @@ def live() -> dict[str, str]:
 
 
 @router.get("/ready")
-def ready() -> dict[str, str]:
-    return {"status": "ready"}
+def ready() -> Dict[str, Any]:
+    # The API serves CRUD while the face model loads; ML endpoints answer 503 until `model` is ready.
+    return {"status": "ready", "model": model_status()}
+
+
+@router.get("/metrics")
+def metrics() -> Dict[str, Any]:
+    return {
+        "auth_cache": principal_cache.stats(),
+        "recognition_cache": result_cache.stats(),
+        "idempotency_cache": face_mark_keys.stats(),
+        "db_pool": pool_status(),
+    }
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+from typing import Any, Dict
+
 from fastapi import APIRouter, Depends, File, UploadFile
 from app.schemas import IdentifyRequest, IdentifyResponse
-from app.services.ml_integration import identify_from_inputs
-from app.utils.dependencies import get_current_teacher
+from app.services.ml_integration import identify_from_inputs, reload_model
+from app.utils.dependencies import get_current_teacher_async
 
 router = APIRouter(prefix="/ml", tags=["ml"])
 
@@ -12,7 +14,18 @@ router = APIRouter(prefix="/ml", tags=["ml"])
 async def identify_face(
     payload: IdentifyRequest = Depends(IdentifyRequest.as_form),
     image_file: UploadFile | None = File(None),
-    current_user=Depends(get_current_teacher),
+    current_user=Depends(get_current_teacher_async),
 ) -> IdentifyResponse:
     result = await identify_from_inputs(payload, image_file)
-    return IdentifyResponse(matched=result.matched, student_id=result.student_id, confidence=result.confidence)
+    return IdentifyResponse(
+        matched=result.matched,
+        student_id=result.student_id,
+        confidence=result.confidence,
+        candidates=result.candidates,
+    )
+
+
+@router.post("/reload")
+async def reload_face_model(current_user=Depends(get_current_teacher_async)) -> Dict[str, Any]:
+    """Load the face model artifact again and swap it in without restarting workers."""
+    return await reload_model()
@@ -1,24 +1,34 @@
 from __future__ import annotations
 
+import asyncio
+from datetime import date
 from typing import List
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, File, HTTPException, Response, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db import get_session
-from app.schemas import StudentCreate, StudentOut, StudentUpdate
-from app.services import student_service
-from app.utils.dependencies import get_current_teacher
+from app.db import get_async_session, get_session
+from app.models import Student
+from app.schemas import AttendanceSummaryOut, FaceEnrollmentOut, StudentCreate, StudentOut, StudentUpdate
+from app.services import attendance_service, ml_integration, student_service
+from app.services.ml_integration import embed_enrollment_photos, read_image_input
+from app.utils.dependencies import get_current_teacher, get_current_teacher_async
+from app.utils.pagination import PageParams, keyset_paginate, page_params
+from app.utils.streaming import OutputFormat, output_format, rows_response
 
 router = APIRouter(prefix="/students", tags=["students"])
 
 
 @router.get("/", response_model=List[StudentOut])
 def list_students(
-    *, db: Session = Depends(get_session), current_user=Depends(get_current_teacher), page: int = Query(1, ge=1), page_size: int = Query(50, ge=1, le=200)
+    response: Response,
+    db: Session = Depends(get_session),
+    current_user=Depends(get_current_teacher),
+    page: PageParams = Depends(page_params()),
 ):
     query = student_service.list_students(db)
-    return query.offset((page - 1) * page_size).limit(page_size).all()
+    return keyset_paginate(query, Student.id, page, response)
 
 
 @router.post("/", response_model=StudentOut, status_code=201)
@@ -30,11 +40,49 @@ def create_student(
     return student_service.create_student(db, payload)
 
 
+@router.post("/register", response_model=StudentOut, status_code=201)
+async def register_student(
+    payload: StudentCreate = Depends(StudentCreate.as_form),
+    images: List[UploadFile] = File(...),
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_teacher_async),
+):
+    """Create a student and enroll their face photos (legacy `/register` flow).
+
+    The student is committed before the faces are journaled, so when the
+    journal write fails the student is deleted again and the request can be retried.
+    """
+    embeddings = await embed_enrollment_photos([await read_image_input(upload=image) for image in images])
+    student = await db.run_sync(student_service.create_student, payload)
+    try:
+        # Journal write and gallery sync are blocking file I/O; keep them off the event loop.
+        await asyncio.to_thread(ml_integration.enroll_student_faces, student.id, embeddings)
+    except HTTPException:
+        await db.run_sync(student_service.delete_student, student.id)
+        raise
+    return student
+
+
 @router.get("/{student_id}", response_model=StudentOut)
 def get_student(student_id: int, db: Session = Depends(get_session), current_user=Depends(get_current_teacher)):
     return student_service.get_student_or_404(db, student_id)
 
 
+@router.get("/{student_id}/attendance-summary", response_model=List[AttendanceSummaryOut])
+async def student_attendance_summary(
+    student_id: int,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    format: OutputFormat = Depends(output_format),
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_teacher_async),
+):
+    """The student's present/absent/unknown counts and rates per course in the date range."""
+    await db.run_sync(attendance_service.ensure_student, student_id)
+    statement = attendance_service.attendance_summary(student_id=student_id, date_from=date_from, date_to=date_to)
+    return await rows_response(db, statement, attendance_service.summary_row, format)
+
+
 @router.put("/{student_id}", response_model=StudentOut)
 def update_student(
     student_id: int,
@@ -45,7 +93,36 @@ def update_student(
     return student_service.update_student(db, student_id, payload)
 
 
+@router.put("/{student_id}/faces", response_model=FaceEnrollmentOut)
+async def enroll_student_faces(
+    student_id: int,
+    images: List[UploadFile] = File(...),
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_teacher_async),
+):
+    """Replace a student's enrolled faces with the uploaded photos (one face per photo)."""
+    await db.run_sync(student_service.get_student_or_404, student_id)
+    embeddings = await embed_enrollment_photos([await read_image_input(upload=image) for image in images])
+    await asyncio.to_thread(ml_integration.enroll_student_faces, student_id, embeddings)
+    return FaceEnrollmentOut(student_id=student_id, embeddings=len(embeddings))
+
+
+@router.delete("/{student_id}/faces", status_code=204)
+async def clear_student_faces(
+    student_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user=Depends(get_current_teacher_async),
+):
+    await db.run_sync(student_service.get_student_or_404, student_id)
+    await asyncio.to_thread(ml_integration.remove_student_faces, student_id)
+    return None
+
+
 @router.delete("/{student_id}", status_code=204)
 def delete_student(student_id: int, db: Session = Depends(get_session), current_user=Depends(get_current_teacher)):
+    student_service.get_student_or_404(db, student_id)
+    # Faces go first: if the delete then fails the student can simply be re-enrolled,
+    # whereas rows left behind for a deleted student could not be removed through the API.
+    ml_integration.remove_student_faces(student_id)
     student_service.delete_student(db, student_id)
     return None
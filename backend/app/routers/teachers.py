@@ -2,26 +2,28 @@ from __future__ import annotations
 
 from typing import List
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Response
 from sqlalchemy.orm import Session
 
 from app.db import get_session
+from app.models import Teacher
 from app.schemas import TeacherCreate, TeacherOut, TeacherUpdate
 from app.services import teacher_service
 from app.utils.dependencies import get_current_teacher
+from app.utils.pagination import PageParams, keyset_paginate, page_params
 
 router = APIRouter(prefix="/teachers", tags=["teachers"])
 
 
 @router.get("/", response_model=List[TeacherOut])
 def list_teachers(
+    response: Response,
     db: Session = Depends(get_session),
     current_user=Depends(get_current_teacher),
-    page: int = Query(1, ge=1),
-    page_size: int = Query(50, ge=1, le=200),
+    page: PageParams = Depends(page_params()),
 ):
     query = teacher_service.list_teachers(db)
-    return query.offset((page - 1) * page_size).limit(page_size).all()
+    return keyset_paginate(query, Teacher.id, page, response)
 
 
 @router.post("/", response_model=TeacherOut, status_code=201)
@@ -5,6 +5,10 @@ from .attendance import (
     AttendanceSessionCreate,
     AttendanceSessionOut,
     AttendanceSessionUpdate,
+    AttendanceSummaryOut,
+    AttendanceTrendOut,
+    GroupAttendanceOut,
+    IdentifyCandidate,
     IdentifyRequest,
     IdentifyResponse,
     IdentifyResult,
@@ -12,7 +16,7 @@ from .attendance import (
 )
 from .auth import CurrentUser, LoginRequest, Token, TokenPayload
 from .course import CourseCreate, CourseOut, CourseUpdate
-from .student import StudentCreate, StudentOut, StudentUpdate
+from .student import FaceEnrollmentOut, StudentCreate, StudentOut, StudentUpdate
 from .teacher import TeacherCreate, TeacherOut, TeacherUpdate
 
 __all__ = [
@@ -22,6 +26,10 @@ __all__ = [
     "AttendanceSessionCreate",
     "AttendanceSessionOut",
     "AttendanceSessionUpdate",
+    "AttendanceSummaryOut",
+    "AttendanceTrendOut",
+    "GroupAttendanceOut",
+    "IdentifyCandidate",
     "IdentifyRequest",
     "IdentifyResponse",
     "IdentifyResult",
@@ -33,6 +41,7 @@ __all__ = [
     "CourseCreate",
     "CourseOut",
     "CourseUpdate",
+    "FaceEnrollmentOut",
     "StudentCreate",
     "StudentOut",
     "StudentUpdate",
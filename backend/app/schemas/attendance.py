@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import date, datetime
-from typing import Optional
+from typing import List, Optional
 
 from fastapi import Form
 from pydantic import BaseModel
@@ -29,6 +29,7 @@ class AttendanceSessionUpdate(BaseModel):
 
 class AttendanceSessionOut(AttendanceSessionBase, TimestampModel):
     id: int
+    opened_by_scan: bool = False
 
     class Config:
         from_attributes = True
@@ -61,10 +62,16 @@ class AttendanceRecordOut(AttendanceRecordBase, TimestampModel):
         from_attributes = True
 
 
+class IdentifyCandidate(BaseModel):
+    student_id: int
+    confidence: float
+
+
 class IdentifyResponse(BaseModel):
     matched: bool
     student_id: Optional[int]
     confidence: float
+    candidates: List[IdentifyCandidate] = []
 
 
 class IdentifyResult(IdentifyResponse):
@@ -99,3 +106,33 @@ class MarkFaceAttendanceRequest(BaseModel):
             image_base64=image_base64,
             notes=notes,
         )
+
+
+class AttendanceSummaryOut(BaseModel):
+    course_id: int
+    student_id: int
+    present: int
+    absent: int
+    unknown: int
+    total: int
+    present_rate: float
+    absent_rate: float
+    unknown_rate: float
+
+
+class AttendanceTrendOut(BaseModel):
+    session_date: date
+    present: int
+    absent: int
+    unknown: int
+    total: int
+    present_rate: float
+
+
+class GroupAttendanceOut(BaseModel):
+    session_id: int
+    faces_detected: int
+    recognized_students: List[int]
+    unrecognized_faces: int
+    snapshot_url: Optional[str] = None
+    records: List[AttendanceRecordOut]
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from typing import Optional
 
+from fastapi import Form
 from pydantic import BaseModel, EmailStr
 
 from .common import TimestampModel
@@ -20,7 +21,30 @@ class StudentBase(BaseModel):
 
 
 class StudentCreate(StudentBase):
-    pass
+    @classmethod
+    def as_form(
+        cls,
+        roll_number: str = Form(...),
+        first_name: str = Form(...),
+        last_name: Optional[str] = Form(None),
+        program: Optional[str] = Form(None),
+        semester: Optional[str] = Form(None),
+        batch: Optional[str] = Form(None),
+        email: Optional[EmailStr] = Form(None),
+        avatar_url: Optional[str] = Form(None),
+        notes: Optional[str] = Form(None),
+    ) -> "StudentCreate":
+        return cls(
+            roll_number=roll_number,
+            first_name=first_name,
+            last_name=last_name,
+            program=program,
+            semester=semester,
+            batch=batch,
+            email=email,
+            avatar_url=avatar_url,
+            notes=notes,
+        )
 
 
 class StudentUpdate(BaseModel):
@@ -39,3 +63,8 @@ class StudentOut(StudentBase, TimestampModel):
 
     class Config:
         from_attributes = True
+
+
+class FaceEnrollmentOut(BaseModel):
+    student_id: int
+    embeddings: int
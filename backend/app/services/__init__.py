@@ -1,10 +1,19 @@
-from . import attendance_service, auth_service, course_service, ml_integration, student_service, teacher_service
+from . import (
+    attendance_service,
+    auth_service,
+    course_service,
+    ml_integration,
+    rollup_service,
+    student_service,
+    teacher_service,
+)
 
 __all__ = [
     "attendance_service",
     "auth_service",
     "course_service",
     "ml_integration",
+    "rollup_service",
     "student_service",
     "teacher_service",
 ]
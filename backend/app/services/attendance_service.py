@@ -1,12 +1,40 @@
 from __future__ import annotations
 
-from datetime import datetime
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, Sequence
 
 from fastapi import HTTPException, status
+from sqlalchemy import Row, Select, case, func, insert, select, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from app.models import AttendanceRecord, AttendanceSession, AttendanceStatus, Course, Student
-from app.schemas import AttendanceRecordCreate, AttendanceRecordUpdate, AttendanceSessionCreate, AttendanceSessionUpdate
+from app.config import settings
+from app.db import upsert_insert
+from app.models import AttendanceDailyRollup, AttendanceRecord, AttendanceSession, AttendanceStatus, Course, Student
+from app.schemas import (
+    AttendanceRecordCreate,
+    AttendanceRecordUpdate,
+    AttendanceSessionCreate,
+    AttendanceSessionUpdate,
+    IdentifyResult,
+)
+from app.services import rollup_service
+from app.utils.cache import TTLCache
+
+# Records created by mark-face per (teacher id, Idempotency-Key) with their course, so a
+# retried request is answered without identifying the frame again. Entries are local
+# to the process; a retry reaching another worker is identified again and the upsert
+# in `mark_face_attendance` still leaves a single record.
+face_mark_keys: TTLCache[tuple[int, str], tuple[int, int]] = TTLCache(
+    maxsize=settings.idempotency_cache_max_entries, ttl=settings.idempotency_key_ttl_seconds
+)
+
+# Id of the session that scans without a session_id go to, per (course id, day).
+active_sessions: TTLCache[tuple[int, date], int] = TTLCache(
+    maxsize=settings.active_session_cache_max_entries, ttl=settings.active_session_cache_ttl_seconds
+)
 
 
 def ensure_course(db: Session, course_id: int) -> Course:
@@ -41,52 +69,247 @@ def create_session(db: Session, payload: AttendanceSessionCreate) -> AttendanceS
     return session
 
 
-def update_session(db: Session, session_id: int, payload: AttendanceSessionUpdate) -> AttendanceSession:
+def get_session_or_404(db: Session, session_id: int) -> AttendanceSession:
     session = db.get(AttendanceSession, session_id)
     if not session:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
-    for field, value in payload.model_dump(exclude_unset=True).items():
+    return session
+
+
+def update_session(db: Session, session_id: int, payload: AttendanceSessionUpdate) -> AttendanceSession:
+    session = get_session_or_404(db, session_id)
+    changes = payload.model_dump(exclude_unset=True)
+    moved = changes.get("session_date", session.session_date) != session.session_date
+    if moved:  # the session's records move to another rollup day
+        active_sessions.pop((session.course_id, session.session_date))
+        rollup_service.apply_changes(db, rollup_service.session_changes(db, session, -1))
+    for field, value in changes.items():
         setattr(session, field, value)
-    db.commit()
+    if moved:
+        rollup_service.apply_changes(db, rollup_service.session_changes(db, session, 1))
+    try:
+        db.commit()
+    except IntegrityError as exc:  # `uq_attendance_sessions_scan`: one scan-opened session per course and day
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Another face-scan session is already open for this course on that day",
+        ) from exc
     db.refresh(session)
     return session
 
 
 def delete_session(db: Session, session_id: int) -> None:
-    session = db.get(AttendanceSession, session_id)
-    if not session:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+    session = get_session_or_404(db, session_id)
+    active_sessions.pop((session.course_id, session.session_date))
+    rollup_service.apply_changes(db, rollup_service.session_changes(db, session, -1))
     db.delete(session)
     db.commit()
 
 
-def list_records(db: Session, session_id: int | None = None):
+def list_records(db: Session, session_id: int | None = None, student_id: int | None = None):
     query = db.query(AttendanceRecord)
     if session_id:
         query = query.filter(AttendanceRecord.session_id == session_id)
+    if student_id:
+        query = query.filter(AttendanceRecord.student_id == student_id)
     return query
 
 
+@contextmanager
+def _one_record_per_student(db: Session) -> Iterator[None]:
+    """Turn a violation of `uq_attendance_session_student` into 409 Conflict."""
+    try:
+        yield
+    except IntegrityError as exc:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Student already has a record in this session"
+        ) from exc
+
+
 def create_record(db: Session, payload: AttendanceRecordCreate) -> AttendanceRecord:
+    session = get_session_or_404(db, payload.session_id)
     ensure_student(db, payload.student_id)
     record = AttendanceRecord(**payload.model_dump())
     db.add(record)
-    db.commit()
+    rollup_service.apply_changes(db, [rollup_service.record_change(session, record.student_id, record.status)])
+    with _one_record_per_student(db):
+        db.commit()
     db.refresh(record)
     return record
 
 
+def create_records_bulk(db: Session, payloads: Sequence[AttendanceRecordCreate]) -> list[AttendanceRecord]:
+    """Insert a whole roll with one existence check per table, one INSERT and one commit."""
+    if not payloads:
+        return []
+
+    session_ids = {payload.session_id for payload in payloads}
+    found = db.scalars(select(AttendanceSession).where(AttendanceSession.id.in_(session_ids)))
+    sessions = {session.id: session for session in found}
+    if missing := sorted(session_ids - sessions.keys()):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Sessions not found: {missing}")
+
+    student_ids = {payload.student_id for payload in payloads if payload.student_id is not None}
+    found_students = set(db.scalars(select(Student.id).where(Student.id.in_(student_ids)))) if student_ids else set()
+    if missing := sorted(student_ids - found_students):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Students not found: {missing}")
+
+    marked = Counter((payload.session_id, payload.student_id) for payload in payloads if payload.student_id is not None)
+    if repeated := sorted(student_id for (_, student_id), count in marked.items() if count > 1):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Students marked twice: {repeated}")
+
+    statement = insert(AttendanceRecord).returning(AttendanceRecord, sort_by_parameter_order=True)
+    with _one_record_per_student(db):
+        records = list(db.scalars(statement, [payload.model_dump() for payload in payloads]))
+    changes = [
+        rollup_service.record_change(sessions[record.session_id], record.student_id, record.status)
+        for record in records
+    ]
+    rollup_service.apply_changes(db, changes)
+    db.commit()
+    return records
+
+
+def _check_date_range(date_from: date | None, date_to: date | None) -> None:
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="date_from must not be after date_to")
+
+
+def attendance_summary(
+    course_id: int | None = None,
+    student_id: int | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+) -> Select:
+    """One row per (course, student) with record counts by status, aggregated by the database.
+
+    Sessions are filtered on `session_date` (both ends inclusive). Records of
+    unrecognised faces have no student and are not attributed to anyone.
+    """
+    _check_date_range(date_from, date_to)
+    counts = [
+        func.coalesce(func.sum(case((AttendanceRecord.status == value, 1), else_=0)), 0).label(value.value)
+        for value in AttendanceStatus
+    ]
+    statement = (
+        select(AttendanceSession.course_id, AttendanceRecord.student_id, *counts, func.count().label("total"))
+        .join(AttendanceSession, AttendanceRecord.session_id == AttendanceSession.id)
+        .where(AttendanceRecord.student_id.is_not(None))
+        .group_by(AttendanceSession.course_id, AttendanceRecord.student_id)
+        .order_by(AttendanceSession.course_id, AttendanceRecord.student_id)
+    )
+    if course_id is not None:
+        statement = statement.where(AttendanceSession.course_id == course_id)
+    if student_id is not None:
+        statement = statement.where(AttendanceRecord.student_id == student_id)
+    if date_from:
+        statement = statement.where(AttendanceSession.session_date >= date_from)
+    if date_to:
+        statement = statement.where(AttendanceSession.session_date <= date_to)
+    return statement
+
+
+def summary_row(row: Row) -> Dict[str, Any]:
+    """`AttendanceSummaryOut` fields for one row of `attendance_summary`."""
+    data = dict(row._mapping)
+    for value in AttendanceStatus:
+        data[f"{value.value}_rate"] = round(data[value.value] / data["total"], 4) if data["total"] else 0.0
+    return data
+
+
+def attendance_trend(
+    course_id: int | None = None,
+    department: str | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+) -> Select:
+    """Daily status totals, read from the pre-aggregated `attendance_daily_rollups` table."""
+    _check_date_range(date_from, date_to)
+    rollup = AttendanceDailyRollup
+    counts = [func.sum(getattr(rollup, value.value)).label(value.value) for value in AttendanceStatus]
+    statement = select(rollup.session_date, *counts).group_by(rollup.session_date).order_by(rollup.session_date)
+    if course_id is not None:
+        statement = statement.where(rollup.course_id == course_id)
+    if department is not None:
+        statement = statement.join(Course, Course.id == rollup.course_id).where(Course.department == department)
+    if date_from:
+        statement = statement.where(rollup.session_date >= date_from)
+    if date_to:
+        statement = statement.where(rollup.session_date <= date_to)
+    return statement
+
+
+def trend_row(row: Row) -> Dict[str, Any]:
+    """`AttendanceTrendOut` fields for one row of `attendance_trend`."""
+    data = dict(row._mapping)
+    data["total"] = sum(data[value.value] for value in AttendanceStatus)
+    data["present_rate"] = round(data["present"] / data["total"], 4) if data["total"] else 0.0
+    return data
+
+
 def update_record(db: Session, record_id: int, payload: AttendanceRecordUpdate) -> AttendanceRecord:
     record = db.get(AttendanceRecord, record_id)
     if not record:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Record not found")
+    previous_status = record.status
     for field, value in payload.model_dump(exclude_unset=True).items():
         setattr(record, field, value)
+    if record.status != previous_status:
+        session = record.session
+        rollup_service.apply_changes(
+            db,
+            [
+                rollup_service.record_change(session, record.student_id, previous_status, -1),
+                rollup_service.record_change(session, record.student_id, record.status),
+            ],
+        )
     db.commit()
     db.refresh(record)
     return record
 
 
+def resolve_active_session(db: Session, course_id: int, session_date: date | None = None) -> AttendanceSession:
+    """The session scans without a `session_id` go to: the course's latest session that day.
+
+    The first scan of a day opens one (`opened_by_scan`); the partial unique index
+    `uq_attendance_sessions_scan` makes concurrent first scans converge on it. The
+    id is cached per (course, day), so later scans only load it by primary key.
+    """
+    session_date = session_date or date.today()
+    key = (course_id, session_date)
+    if (cached_id := active_sessions.get(key)) is not None:
+        session = db.get(AttendanceSession, cached_id)
+        if session is not None and session.course_id == course_id and session.session_date == session_date:
+            return session
+        # Deleted, moved by another process, or its opening transaction rolled back.
+        active_sessions.pop(key)
+
+    same_day = (AttendanceSession.course_id == course_id, AttendanceSession.session_date == session_date)
+    latest = select(AttendanceSession).where(*same_day).order_by(AttendanceSession.id.desc()).limit(1)
+    session = db.scalars(latest).first()
+    if session is None:
+        statement = (
+            upsert_insert(db, AttendanceSession)
+            .values(course_id=course_id, session_date=session_date, started_at=datetime.utcnow(), opened_by_scan=True)
+            .on_conflict_do_nothing(index_elements=["course_id", "session_date"], index_where=text("opened_by_scan"))
+            .returning(AttendanceSession)
+        )
+        session = db.scalar(statement)
+    if session is None:  # a concurrent scan opened it first
+        session = db.scalars(select(AttendanceSession).where(*same_day, AttendanceSession.opened_by_scan)).one()
+    active_sessions.set(key, session.id)
+    return session
+
+
+def _resolve_face_session(db: Session, course_id: int, session_id: int | None) -> AttendanceSession:
+    ensure_course(db, course_id)
+    if session_id:
+        return get_session_or_404(db, session_id)
+    return resolve_active_session(db, course_id)
+
+
 def mark_face_attendance(
     db: Session,
     course_id: int,
@@ -96,26 +319,124 @@ def mark_face_attendance(
     notes: str | None = None,
     snapshot_url: str | None = None,
 ) -> AttendanceRecord:
-    ensure_course(db, course_id)
+    """Record one scanned face; scanning a student again updates their record in the session.
 
-    if session_id:
-        session = db.get(AttendanceSession, session_id)
-        if not session:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
-    else:
-        session = AttendanceSession(course_id=course_id, started_at=datetime.utcnow())
-        db.add(session)
-        db.flush()
-
-    record = AttendanceRecord(
-        session_id=session.id,
-        student_id=student_id,
-        status=AttendanceStatus.present if student_id else AttendanceStatus.unknown,
-        confidence=confidence,
-        payload=notes,
-        snapshot_url=snapshot_url,
-    )
-    db.add(record)
+    Repeat scans keep the highest confidence and the latest snapshot, so duplicate
+    scans and retries never add rows. Every unrecognised face gets its own record.
+    """
+    session = _resolve_face_session(db, course_id, session_id)
+    values = {
+        "session_id": session.id,
+        "student_id": student_id,
+        "status": AttendanceStatus.present if student_id else AttendanceStatus.unknown,
+        "confidence": confidence,
+        "payload": notes,
+        "snapshot_url": snapshot_url,
+    }
+    if student_id is None:
+        record = AttendanceRecord(**values)
+        db.add(record)
+        db.commit()
+        db.refresh(record)
+        return record
+
+    record, changes = _merge_face_scan(db, session, values)
+    rollup_service.apply_changes(db, changes)
     db.commit()
     db.refresh(record)
     return record
+
+
+def _merge_face_scan(
+    db: Session, session: AttendanceSession, values: Dict[str, Any]
+) -> tuple[AttendanceRecord, list[rollup_service.RollupChange]]:
+    """Insert a recognised student's record, or fold the scan into the one they already have.
+
+    Returns the record and the rollup changes for the caller to apply before committing.
+    """
+    # ON CONFLICT DO NOTHING tells an insert apart from a repeat scan on both databases;
+    # the repeat then updates the locked row, so the rollup sees its previous status.
+    student_id = values["student_id"]
+    statement = (
+        upsert_insert(db, AttendanceRecord)
+        .values(**values)
+        .on_conflict_do_nothing(index_elements=["session_id", "student_id"])
+        .returning(AttendanceRecord)
+    )
+    record = db.scalar(statement)
+    if record is not None:
+        return record, [rollup_service.record_change(session, student_id, record.status)]
+
+    record = db.scalars(
+        select(AttendanceRecord)
+        .where(AttendanceRecord.session_id == session.id, AttendanceRecord.student_id == student_id)
+        .with_for_update()
+    ).one()
+    changes = []
+    if record.status != AttendanceStatus.present:
+        changes = [
+            rollup_service.record_change(session, student_id, record.status, -1),
+            rollup_service.record_change(session, student_id, AttendanceStatus.present),
+        ]
+    record.status = AttendanceStatus.present
+    record.confidence = max(float(record.confidence or 0.0), values["confidence"])
+    record.snapshot_url = values["snapshot_url"] or record.snapshot_url
+    record.payload = values["payload"] if values["payload"] is not None else record.payload
+    return record, changes
+
+
+def replay_face_mark(db: Session, teacher_id: int, key: str, course_id: int) -> AttendanceRecord | None:
+    """The record an earlier mark-face with this Idempotency-Key produced, if still known."""
+    entry = face_mark_keys.get((teacher_id, key))
+    if entry is None:
+        return None
+    marked_course_id, record_id = entry
+    if marked_course_id != course_id:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Idempotency-Key was used for another course"
+        )
+    return db.get(AttendanceRecord, record_id)
+
+
+def remember_face_mark(teacher_id: int, key: str, course_id: int, record: AttendanceRecord) -> None:
+    face_mark_keys.set((teacher_id, key), (course_id, record.id))
+
+
+def mark_group_attendance(
+    db: Session,
+    course_id: int,
+    matches: Sequence[IdentifyResult],
+    session_id: int | None = None,
+    notes: str | None = None,
+    snapshot_url: str | None = None,
+) -> tuple[AttendanceSession, list[AttendanceRecord]]:
+    """Record every recognised face of a group photo in a single transaction.
+
+    Students already recorded in the session are updated like a repeat mark-face scan,
+    so a concurrent scan of the same student never fails the photo.
+    """
+    session = _resolve_face_session(db, course_id, session_id)
+
+    best: Dict[int, IdentifyResult] = {}
+    for match in matches:
+        if match.matched and match.confidence > getattr(best.get(match.student_id), "confidence", -1.0):
+            best[match.student_id] = match
+    records, changes = [], []
+    # Sorted so concurrent group photos lock the same records in the same order.
+    for student_id in sorted(best):
+        values = {
+            "session_id": session.id,
+            "student_id": student_id,
+            "status": AttendanceStatus.present,
+            "confidence": best[student_id].confidence,
+            "payload": notes,
+            "snapshot_url": snapshot_url,
+        }
+        record, record_changes = _merge_face_scan(db, session, values)
+        records.append(record)
+        changes.extend(record_changes)
+    rollup_service.apply_changes(db, changes)
+    db.commit()
+    for record in records:
+        db.refresh(record)
+    return session, records
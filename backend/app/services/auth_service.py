@@ -3,10 +3,22 @@ from __future__ import annotations
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.models import Teacher
-from app.schemas import LoginRequest, TeacherCreate
+from app.schemas import CurrentUser, LoginRequest, TeacherCreate
+from app.utils.cache import TTLCache
 from app.utils.security import hash_password, verify_password
 
+# Authenticated principals keyed by the token's (sub, iat), so each issued
+# token resolves its teacher from the database at most once per TTL.
+principal_cache: TTLCache[tuple[str, int | None], CurrentUser] = TTLCache(
+    maxsize=settings.auth_cache_max_entries, ttl=settings.auth_cache_ttl_seconds
+)
+
+
+def invalidate_principal(email: str) -> None:
+    principal_cache.invalidate(lambda key: key[0] == email)
+
 
 def authenticate_teacher(db: Session, credentials: LoginRequest) -> Teacher:
     teacher = db.query(Teacher).filter(Teacher.email == credentials.email).first()
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 from fastapi import HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.models import Course
+from app.models import Course, Enrollment
 from app.schemas import CourseCreate, CourseUpdate
 
 
@@ -39,3 +40,7 @@ def delete_course(db: Session, course_id: int) -> None:
     course = get_course_or_404(db, course_id)
     db.delete(course)
     db.commit()
+
+
+def list_enrolled_student_ids(db: Session, course_id: int) -> list[int]:
+    return list(db.scalars(select(Enrollment.student_id).where(Enrollment.course_id == course_id)))
@@ -1,25 +1,297 @@
 from __future__ import annotations
 
+import asyncio
+import binascii
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Collection, Dict, List, Sequence
+
+import numpy as np
+
 from fastapi import HTTPException, UploadFile, status
+from loguru import logger
 
-from app.ml import decode_base64_image, recognizer
+from app.config import settings
+from app.ml import decode_base64_image, get_recognizer, load_recognizer, recognizer_status
+from app.ml import artifacts, worker_pool
+from app.ml.batching import MicroBatcher
+from app.ml.recognizer import IdentifyJob, loaded_recognizer, reload_recognizer
+from app.ml.result_cache import RecognitionCache, content_key
 from app.schemas import IdentifyRequest, IdentifyResult
+from app.utils.file_storage import guess_suffix
+
+
+def _identify_batch(jobs: Sequence[IdentifyJob]) -> List[IdentifyResult | Exception]:
+    return get_recognizer().identify_batch(jobs)
+
+
+# With RECOGNITION_WORKERS > 0 decode + inference run in preloaded worker
+# processes so the API process keeps its GIL for request handling.
+recognition_pool = worker_pool.create_recognition_pool(settings.recognition_workers)
+
+identify_batcher: MicroBatcher[IdentifyJob, IdentifyResult] = MicroBatcher(
+    worker_pool.identify_batch if recognition_pool else _identify_batch,
+    max_batch_size=settings.face_batch_max_size,
+    max_wait_ms=settings.face_batch_max_wait_ms,
+    max_in_flight=max(settings.recognition_workers, 1),
+    executor=recognition_pool,
+)
+
+
+result_cache = RecognitionCache(
+    maxsize=settings.face_result_cache_max_entries,
+    ttl=settings.face_result_cache_ttl_seconds,
+)
+
+
+_workers_ready: Future | None = None
+_workers_version: str | None = None
+_reload_guard = threading.Lock()
+_watch_task: asyncio.Task | None = None
+
+
+def _model_future() -> Future:
+    """Future resolving once the model is usable, starting the load if needed."""
+    global _workers_ready, _workers_version
+    if recognition_pool is None:
+        return load_recognizer()
+    if _workers_ready is None:
+        _workers_version = artifacts.fingerprint(settings.face_model_path)
+        _workers_ready = worker_pool.warm_up(recognition_pool, settings.recognition_workers)
+    return _workers_ready
+
+
+def start_recognition() -> None:
+    """Kick off the model load in the background; the API serves requests meanwhile."""
+    global _watch_task
+    if settings.face_model_preload:
+        _model_future()
+    if settings.face_model_watch_seconds > 0:
+        _watch_task = asyncio.get_running_loop().create_task(watch_model_artifact(settings.face_model_watch_seconds))
+
+
+async def reload_model() -> Dict[str, Any]:
+    """Load the current artifact in the background and swap it in once it is ready.
+
+    In-process, the recognizer reference is replaced; identifications already
+    holding the old one finish on it. With worker processes a fresh pool is
+    warmed up and swapped in, and the old pool drains its queued batches
+    before exiting. A failed load leaves the previous model serving.
+    """
+    global recognition_pool, _workers_ready, _workers_version
+    if not _reload_guard.acquire(blocking=False):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A model reload is already running")
+    try:
+        if recognition_pool is None:
+            await asyncio.to_thread(reload_recognizer)
+        else:
+            version = artifacts.fingerprint(settings.face_model_path)
+            new_pool = worker_pool.create_recognition_pool(settings.recognition_workers)
+            ready = worker_pool.warm_up(new_pool, settings.recognition_workers)
+            try:
+                await asyncio.wrap_future(ready)
+            except BaseException:
+                new_pool.shutdown(wait=False, cancel_futures=True)
+                raise
+            # Swapped on the event loop thread, so no batch is dispatched half-way through.
+            old_pool, recognition_pool = recognition_pool, new_pool
+            identify_batcher.executor = new_pool
+            _workers_ready, _workers_version = ready, version
+            old_pool.shutdown(wait=False)
+    except HTTPException:
+        raise
+    except Exception as exc:
+        logger.error("Face model reload failed; keeping the previous model: {}", exc)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Face model reload failed; previous model kept"
+        ) from exc
+    finally:
+        _reload_guard.release()
+    result_cache.clear()  # cached identifications came from the previous gallery
+    return model_status()
+
+
+async def watch_model_artifact(interval: float) -> None:
+    """Reload when the artifact files change and have stayed unchanged for one more poll."""
+    loaded = previous = await asyncio.to_thread(artifacts.fingerprint, settings.face_model_path)
+    while True:
+        await asyncio.sleep(interval)
+        current = await asyncio.to_thread(artifacts.fingerprint, settings.face_model_path)
+        # Waiting for two identical polls skips artifacts that are still being copied in.
+        if current != loaded and current == previous:
+            logger.info("Face model artifact changed (version {}); reloading", current)
+            try:
+                await reload_model()
+            except HTTPException as exc:
+                logger.warning("Automatic face model reload skipped: {}", exc.detail)
+            loaded = current
+        previous = current
+
+
+def model_status() -> Dict[str, Any]:
+    if recognition_pool is None:
+        return recognizer_status()
+    future = _workers_ready
+    if future is None:
+        return {"state": "not_loaded", "workers": settings.recognition_workers}
+    if not future.done():
+        return {"state": "loading", "workers": settings.recognition_workers}
+    if future.exception() is not None:
+        return {"state": "failed", "error": str(future.exception()), "workers": settings.recognition_workers}
+    return {"state": "ready", "version": _workers_version, "workers": settings.recognition_workers}
+
+
+async def wait_for_model() -> None:
+    """Wait up to FACE_MODEL_LOAD_WAIT_SECONDS for the model, answering 503 while it is unavailable."""
+    future = _model_future()
+    if not future.done():
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), settings.face_model_load_wait_seconds)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Face model is still loading",
+                headers={"Retry-After": "5"},
+            )
+        except Exception:
+            pass  # reported below
+    if future.exception() is not None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Face model failed to load")
+
+
+async def shutdown_recognition() -> None:
+    if _watch_task is not None:
+        _watch_task.cancel()
+    await identify_batcher.aclose()
+    if recognition_pool is not None:
+        recognition_pool.shutdown(wait=False, cancel_futures=True)
+
+
+@dataclass(frozen=True)
+class ImageInput:
+    """An image body read exactly once and shared by recognition and snapshot storage."""
+
+    data: bytes
+    suffix: str
+
+    @property
+    def view(self) -> memoryview:
+        return memoryview(self.data)
+
+
+def _content_type_from_data_url(value: str) -> str | None:
+    header, separator, _ = value.partition(",")
+    if not separator or not header.startswith("data:"):
+        return None
+    return header[len("data:") :].split(";", 1)[0] or None
+
+
+async def read_image_input(request: IdentifyRequest | None = None, upload: UploadFile | None = None) -> ImageInput:
+    """Ingest a base64 field or a multipart upload into a single in-memory buffer.
+
+    This is the only place the body is read; callers hand `ImageInput.data` to the
+    recognizer and `ImageInput.view` to `save_snapshot` without further copies.
+    """
+    if request and request.image_base64:
+        try:
+            data = decode_base64_image(request.image_base64)
+        except (binascii.Error, ValueError) as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid base64 image") from exc
+        if data:
+            return ImageInput(data, guess_suffix(content_type=_content_type_from_data_url(request.image_base64)))
+
+    if upload is not None:
+        data = await upload.read()
+        if data:
+            return ImageInput(data, guess_suffix(upload.filename, upload.content_type))
+
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Image data missing")
+
+
+async def identify_image(
+    image: ImageInput,
+    course_id: int | None = None,
+    candidate_ids: Collection[int] | None = None,
+) -> IdentifyResult:
+    job = IdentifyJob(
+        image_bytes=image.data,
+        course_id=course_id,
+        candidate_ids=frozenset(candidate_ids) if candidate_ids is not None else None,
+    )
+    # Retried uploads of the same frame reuse a recent result for that roster.
+    cache_key = content_key(image.data) if result_cache.enabled else None
+    if cache_key is not None and (cached := result_cache.get(job.scope, cache_key)) is not None:
+        return cached
+    await wait_for_model()
+    try:
+        result = await identify_batcher.submit(job)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    if cache_key is not None:
+        result_cache.set(job.scope, cache_key, result)
+    return result
+
+
+async def identify_group_image(
+    image: ImageInput,
+    course_id: int | None = None,
+    candidate_ids: Collection[int] | None = None,
+) -> List[IdentifyResult]:
+    await wait_for_model()
+    if recognition_pool is not None:
+        loop = asyncio.get_running_loop()
+        scope = frozenset(candidate_ids) if candidate_ids is not None else None
+        return await loop.run_in_executor(recognition_pool, worker_pool.identify_group, image.data, course_id, scope)
+    return await asyncio.to_thread(
+        get_recognizer().identify_group, image.data, course_id=course_id, candidate_ids=candidate_ids
+    )
 
 
 async def identify_from_inputs(
     request: IdentifyRequest | None = None,
     upload: UploadFile | None = None,
+    course_id: int | None = None,
+    candidate_ids: Collection[int] | None = None,
 ) -> IdentifyResult:
-    image_bytes: bytes | None = None
+    image = await read_image_input(request, upload)
+    return await identify_image(image, course_id=course_id, candidate_ids=candidate_ids)
 
-    if request and request.image_base64:
-        image_bytes = decode_base64_image(request.image_base64)
 
-    if not image_bytes and upload is not None:
-        image_bytes = await upload.read()
+async def embed_enrollment_photos(images: Sequence[ImageInput]) -> np.ndarray:
+    """Embed enrolment photos (one face each) with the loaded model."""
+    await wait_for_model()
+    data = [image.data for image in images]
+    try:
+        if recognition_pool is not None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(recognition_pool, worker_pool.embed_enrollment, data)
+        return await asyncio.to_thread(get_recognizer().embed_enrollment, data)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
-    if not image_bytes:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Image data missing")
 
-    result = recognizer.identify(image_bytes)
-    return result
+def _publish_enrollment(op: str, student_id: int, embeddings: np.ndarray | None = None) -> None:
+    # Every recognizer (this process, worker processes, other API processes)
+    # replays the journal before its next identification; the local one is
+    # synced now so the change is visible to this process immediately.
+    try:
+        artifacts.append_journal(settings.face_model_path, op, student_id, embeddings)
+    except OSError as exc:
+        logger.error("Could not record face enrollment change for student {}: {}", student_id, exc)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Face enrollment could not be stored"
+        ) from exc
+    service = loaded_recognizer()
+    if service is not None:
+        service.sync_enrollments()
+    result_cache.clear()
+
+
+def enroll_student_faces(student_id: int, embeddings: np.ndarray) -> None:
+    """Replace a student's gallery rows; costs O(their embeddings), not a gallery rebuild."""
+    _publish_enrollment("upsert", student_id, embeddings)
+
+
+def remove_student_faces(student_id: int) -> None:
+    _publish_enrollment("remove", student_id)
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.db import upsert_insert
+from app.models import AttendanceDailyRollup, AttendanceRecord, AttendanceSession, AttendanceStatus
+
+# (course_id, session_date, student_id, status, delta): one record counted in or out.
+RollupChange = Tuple[int, date, "int | None", AttendanceStatus, int]
+
+STATUS_COLUMNS = tuple(value.value for value in AttendanceStatus)
+
+
+def record_change(
+    session: AttendanceSession, student_id: int | None, status: AttendanceStatus, delta: int = 1
+) -> RollupChange:
+    return session.course_id, session.session_date, student_id, AttendanceStatus(status), delta
+
+
+def session_changes(db: Session, session: AttendanceSession, delta: int) -> List[RollupChange]:
+    """Changes counting every record of `session` in (`delta=1`) or out (`delta=-1`)."""
+    counts = db.execute(
+        select(AttendanceRecord.student_id, AttendanceRecord.status, func.count())
+        .where(AttendanceRecord.session_id == session.id, AttendanceRecord.student_id.is_not(None))
+        .group_by(AttendanceRecord.student_id, AttendanceRecord.status)
+    )
+    return [record_change(session, student_id, status, delta * count) for student_id, status, count in counts]
+
+
+def apply_changes(db: Session, changes: Iterable[RollupChange]) -> None:
+    """Add the changes to the rollup with one upsert, inside the caller's transaction.
+
+    Records without a student (unrecognised faces) are not rolled up.
+    """
+    totals: Dict[Tuple[int, date, int], Dict[str, int]] = defaultdict(lambda: dict.fromkeys(STATUS_COLUMNS, 0))
+    for course_id, session_date, student_id, status, delta in changes:
+        if student_id is not None and delta:
+            totals[(course_id, session_date, student_id)][status.value] += delta
+    # Sorted so concurrent transactions lock rollup rows in the same order.
+    rows = [
+        {"course_id": course_id, "session_date": session_date, "student_id": student_id, **counts}
+        for (course_id, session_date, student_id), counts in sorted(totals.items())
+        if any(counts.values())
+    ]
+    if not rows:
+        return
+
+    table = AttendanceDailyRollup.__table__
+    statement = upsert_insert(db, table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.course_id, table.c.session_date, table.c.student_id],
+        set_={column: table.c[column] + statement.excluded[column] for column in STATUS_COLUMNS},
+    )
+    db.execute(statement, rows)
+
+    # Drop days that no longer count any record so trends do not report empty days.
+    emptied = [
+        (row["course_id"], row["session_date"], row["student_id"])
+        for row in rows
+        if any(row[column] < 0 for column in STATUS_COLUMNS)
+    ]
+    if emptied:
+        key = tuple_(table.c.course_id, table.c.session_date, table.c.student_id)
+        db.execute(delete(table).where(key.in_(emptied), *(table.c[column] == 0 for column in STATUS_COLUMNS)))
+
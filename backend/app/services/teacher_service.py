@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 
 from app.models import Teacher
 from app.schemas import TeacherCreate, TeacherUpdate
+from app.services.auth_service import invalidate_principal
 from app.utils.security import hash_password
 
 
@@ -42,6 +43,7 @@ def update_teacher(db: Session, teacher_id: int, payload: TeacherUpdate) -> Teac
         setattr(teacher, field, value)
     db.commit()
     db.refresh(teacher)
+    invalidate_principal(teacher.email)
     return teacher
 
 
@@ -49,3 +51,4 @@ def delete_teacher(db: Session, teacher_id: int) -> None:
     teacher = get_teacher_or_404(db, teacher_id)
     db.delete(teacher)
     db.commit()
+    invalidate_principal(teacher.email)
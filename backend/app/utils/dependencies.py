@@ -1,28 +1,61 @@
 from __future__ import annotations
 
+import time
+from typing import Any, Dict
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.config import settings
-from app.db import get_session
+from app.db import get_async_session, get_session
 from app.models import Teacher
 from app.schemas import CurrentUser
+from app.services.auth_service import principal_cache
 from app.utils.security import decode_token
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.api_prefix}/auth/login")
 
 
-def get_current_teacher(
-    db: Session = Depends(get_session), token: str = Depends(oauth2_scheme)
-) -> CurrentUser:
+def _decode_credentials(token: str) -> Dict[str, Any]:
     try:
-        payload = decode_token(token)
+        return decode_token(token)
     except ValueError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
-    teacher = db.query(Teacher).filter(Teacher.email == payload.get("sub")).first()
+
+def _remember(payload: Dict[str, Any], teacher: Teacher | None) -> CurrentUser:
     if not teacher:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    return CurrentUser.model_validate(teacher)
+    principal = CurrentUser.model_validate(teacher)
+    # Never outlive the token itself.
+    principal_cache.set((payload.get("sub"), payload.get("iat")), principal, ttl=payload.get("exp", 0) - time.time())
+    return principal
+
+
+def get_current_teacher(
+    db: Session = Depends(get_session), token: str = Depends(oauth2_scheme)
+) -> CurrentUser:
+    payload = _decode_credentials(token)
+    principal = principal_cache.get((payload.get("sub"), payload.get("iat")))
+    if principal is not None:
+        return principal
+
+    teacher = db.query(Teacher).filter(Teacher.email == payload.get("sub")).first()
+    return _remember(payload, teacher)
+
+
+async def get_current_teacher_async(
+    db: AsyncSession = Depends(get_async_session), token: str = Depends(oauth2_scheme)
+) -> CurrentUser:
+    """Same as `get_current_teacher` for async routers, without a threadpool hop."""
+    payload = _decode_credentials(token)
+    principal = principal_cache.get((payload.get("sub"), payload.get("iat")))
+    if principal is not None:
+        return principal
+
+    teacher = (await db.scalars(select(Teacher).where(Teacher.email == payload.get("sub")))).first()
+    return _remember(payload, teacher)
@@ -1,34 +1,89 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import io
+import mimetypes
+import os
+import tempfile
 from pathlib import Path
-from typing import Optional
-from uuid import uuid4
-import shutil
-
-from fastapi import UploadFile
 
 from app.config import settings
 
+CHUNK_SIZE = 1024 * 1024
+SNAPSHOT_DIR = "snapshots"
+SUFFIX_ALIASES = {".jpeg": ".jpg", ".jpe": ".jpg"}
+# Snapshots are served back from `media_url`, so only image extensions may be stored;
+# a client-chosen `.html` or `.svg` would otherwise be served as active content.
+IMAGE_SUFFIXES = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp", "BMP": ".bmp"}
+SNIFF_BYTES = 64 * 1024
+
+
+def guess_suffix(filename: str | None = None, content_type: str | None = None) -> str:
+    """Image extension for a snapshot from its upload filename or MIME type (`.jpg` by default)."""
+    suffix = Path(filename or "").suffix.lower()
+    if not suffix and content_type:
+        suffix = mimetypes.guess_extension(content_type.strip().lower()) or ""
+    suffix = SUFFIX_ALIASES.get(suffix, suffix)
+    return suffix if suffix in IMAGE_SUFFIXES.values() else ".jpg"
+
+
+def image_suffix(data: bytes | memoryview, fallback: str = ".jpg") -> str:
+    """Extension of the image format Pillow detects in `data`'s header, else `fallback`."""
+    try:
+        from PIL import Image
+
+        with Image.open(io.BytesIO(data[:SNIFF_BYTES])) as image:
+            detected = image.format
+    except Exception:  # not an image Pillow recognises, or Pillow is not installed
+        return fallback if fallback in IMAGE_SUFFIXES.values() else ".jpg"
+    return IMAGE_SUFFIXES.get(detected, ".jpg")
+
 
-def save_snapshot(course_id: int, upload: UploadFile, session_id: Optional[int] = None) -> str:
-    """Persist an uploaded snapshot under the media root and return a public URL."""
-    media_root: Path = settings.media_root
-    media_root.mkdir(parents=True, exist_ok=True)
+def _content_path(digest: str, suffix: str) -> Path:
+    # Two levels of fan-out keep directories small once millions of frames are stored.
+    return settings.media_root / SNAPSHOT_DIR / digest[:2] / digest[2:4] / f"{digest}{suffix}"
 
-    course_dir = media_root / f"course_{course_id}"
-    if session_id:
-        target_dir = course_dir / f"session_{session_id}"
-    else:
-        target_dir = course_dir / "unassigned"
-    target_dir.mkdir(parents=True, exist_ok=True)
 
-    suffix = Path(upload.filename or "").suffix or ".jpg"
-    file_name = f"{uuid4().hex}{suffix}"
-    destination = target_dir / file_name
+def _publish(temp_path: str, destination: Path) -> None:
+    if destination.exists():
+        os.unlink(temp_path)  # identical frame stored concurrently
+        return
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(temp_path, destination)
 
-    upload.file.seek(0)
-    with destination.open("wb") as buffer:
-        shutil.copyfileobj(upload.file, buffer)
 
-    relative_path = destination.relative_to(media_root)
+def _public_url(destination: Path) -> str:
+    relative_path = destination.relative_to(settings.media_root)
     return f"{settings.media_url}/{relative_path.as_posix()}"
+
+
+def _store(view: memoryview, suffix: str) -> Path:
+    destination = _content_path(hashlib.sha256(view).hexdigest(), image_suffix(view, suffix))
+    if destination.exists():
+        return destination  # e.g. a retried upload; nothing to write
+
+    incoming_dir = settings.media_root / SNAPSHOT_DIR / ".incoming"
+    incoming_dir.mkdir(parents=True, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=incoming_dir)
+    try:
+        with os.fdopen(handle, "wb") as buffer:
+            for offset in range(0, len(view), CHUNK_SIZE):
+                buffer.write(view[offset : offset + CHUNK_SIZE])
+        _publish(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return destination
+
+
+async def save_snapshot(data: bytes | memoryview, suffix: str = ".jpg") -> str:
+    """Write an already-read image body to content-addressed storage and return its public URL.
+
+    Hashing and writing run off the event loop over slices of the caller's buffer,
+    so the body is never copied; frames already on disk are not stored twice. The
+    extension follows the detected image format, with `suffix` only as a fallback.
+    """
+    destination = await asyncio.to_thread(_store, memoryview(data), suffix)
+    return _public_url(destination)
@@ -1,12 +1,89 @@
 from __future__ import annotations
 
-from typing import Iterable, Sequence, Tuple
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, List
 
-from fastapi import Query
+from fastapi import HTTPException, Query, Response, status
+from sqlalchemy import text
+from sqlalchemy.orm import InstrumentedAttribute
 from sqlalchemy.orm import Query as SAQuery
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
 
-def paginate(query: SAQuery, page: int = Query(1, ge=1), page_size: int = Query(25, ge=1, le=100)) -> Tuple[int, Sequence]:
-    total = query.count()
-    items = query.offset((page - 1) * page_size).limit(page_size).all()
-    return total, items
+
+@dataclass(frozen=True)
+class PageParams:
+    cursor: str | None
+    page_size: int
+    include_total: bool
+
+
+def page_params(default_size: int = 50, max_size: int = 200) -> Callable[..., PageParams]:
+    """Build a dependency reading `cursor`, `page_size` and `include_total` query parameters."""
+
+    def dependency(
+        cursor: str | None = Query(None, description=f"Opaque cursor from the previous page's {NEXT_CURSOR_HEADER} header"),
+        page_size: int = Query(default_size, ge=1, le=max_size),
+        include_total: bool = Query(False, description=f"Report an (approximate) total in {TOTAL_COUNT_HEADER}"),
+    ) -> PageParams:
+        return PageParams(cursor=cursor, page_size=page_size, include_total=include_total)
+
+    return dependency
+
+
+def encode_cursor(value: Any) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"k": value}).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value = json.loads(base64.urlsafe_b64decode(padded))["k"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        value = None
+    # Cursors are integer keys; anything else would only fail later, inside the query.
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+    return value
+
+
+def keyset_paginate(
+    query: SAQuery, key: InstrumentedAttribute, params: PageParams, response: Response, descending: bool = False
+) -> List:
+    """Return one page ordered by `key`, seeking past the cursor instead of using OFFSET.
+
+    The body stays a plain list; the cursor for the next page (if any) is sent in
+    the `X-Next-Cursor` header and the optional total in `X-Total-Count`.
+    `descending=True` pages newest-first, so clients reading only the first page
+    still see the latest rows.
+    """
+    if params.include_total:
+        response.headers[TOTAL_COUNT_HEADER] = str(estimate_total(query))
+
+    if params.cursor is not None:
+        cursor = decode_cursor(params.cursor)
+        query = query.filter(key < cursor if descending else key > cursor)
+    items = query.order_by(key.desc() if descending else key).limit(params.page_size + 1).all()
+
+    if len(items) > params.page_size:
+        items = items[: params.page_size]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(items[-1], key.key))
+    return items
+
+
+def estimate_total(query: SAQuery) -> int:
+    """Planner row estimate for unfiltered PostgreSQL tables, exact COUNT otherwise."""
+    session = query.session
+    if session.get_bind().dialect.name == "postgresql" and query.whereclause is None:
+        table = query.column_descriptions[0]["entity"].__table__
+        estimate = session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"), {"table": table.name}
+        ).scalar()
+        # reltuples is -1 until the table has been vacuumed or analyzed.
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+    return query.order_by(None).count()
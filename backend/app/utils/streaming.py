@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, Dict, Literal
+
+from fastapi import Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Row, Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Rows fetched from the cursor and written to the client per chunk.
+STREAM_BATCH_ROWS = 500
+
+OutputFormat = Literal["json", "ndjson"]
+
+
+def output_format(
+    format: OutputFormat = Query("json", description="`ndjson` streams one JSON object per line"),
+) -> OutputFormat:
+    return format
+
+
+async def rows_response(
+    db: AsyncSession, statement: Select, to_dict: Callable[[Row], Dict[str, Any]], format: OutputFormat = "json"
+):
+    """All rows of `statement` as a JSON list, or streamed as NDJSON without holding them in memory.
+
+    The stream runs on its own connection because the request's session is
+    closed before a streaming body is sent.
+    """
+    if format == "json":
+        return [to_dict(row) for row in await db.execute(statement)]
+
+    async def lines():
+        async with db.bind.connect() as connection:
+            result = await connection.stream(statement.execution_options(yield_per=STREAM_BATCH_ROWS))
+            async for rows in result.partitions():
+                yield "".join(json.dumps(to_dict(row), default=str) + "\n" for row in rows)
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
@@ -0,0 +1,66 @@
+"""Compare exact gallery search with the IVF index on a synthetic gallery.
+
+Run from `backend/`:
+
+    python -m benchmarks.ann_benchmark --rows 100000 --dimension 128 --nprobe 4 8 16 32
+
+Recall is the share of queries whose best student matches exact search.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from app.ml.ann import IVFIndex
+from app.ml.gallery import EmbeddingGallery, normalize_rows
+
+
+def synthetic_gallery(rows: int, dimension: int, seed: int = 0) -> np.ndarray:
+    # Faces cluster (by camera, lighting, demographics), so sample around centres.
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((max(rows // 500, 1), dimension))
+    return normalize_rows(centres[rng.integers(len(centres), size=rows)] + 0.6 * rng.standard_normal((rows, dimension)))
+
+
+def time_search(gallery: EmbeddingGallery, queries: np.ndarray, k: int) -> tuple[list, float]:
+    started = time.perf_counter()
+    results = [gallery.search(query, k=k) for query in queries]
+    return results, (time.perf_counter() - started) / len(queries) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dimension", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    embeddings = synthetic_gallery(args.rows, args.dimension)
+    rng = np.random.default_rng(1)
+    picks = rng.integers(args.rows, size=args.queries)
+    queries = normalize_rows(embeddings[picks] + 0.2 * rng.standard_normal((args.queries, args.dimension)))
+
+    gallery = EmbeddingGallery(embeddings, np.arange(args.rows), normalized=True)
+    exact, exact_ms = time_search(gallery, queries, args.k)
+    print(f"rows={args.rows} dim={args.dimension} queries={args.queries}")
+    print(f"{'search':<16}{'ms/query':>10}{'recall@1':>10}{'speedup':>9}")
+    print(f"{'exact':<16}{exact_ms:>10.3f}{1.0:>10.3f}{1.0:>9.1f}")
+
+    started = time.perf_counter()
+    index = IVFIndex.build(gallery.embeddings, nlist=args.nlist)
+    print(f"(IVF build with {len(index.centroids)} lists: {time.perf_counter() - started:.1f}s)")
+    for nprobe in args.nprobe:
+        index.nprobe = min(nprobe, len(index.centroids))
+        gallery.attach_index(index)
+        approximate, ann_ms = time_search(gallery, queries, args.k)
+        recall = np.mean([bool(a) and bool(e) and a[0][0] == e[0][0] for a, e in zip(approximate, exact)])
+        print(f"{f'ivf nprobe={nprobe}':<16}{ann_ms:>10.3f}{recall:>10.3f}{exact_ms / ann_ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db import Base, get_async_session, get_session
+from app.main import app
+from app.ml.gallery import EmbeddingGallery
+from app.ml.recognizer import FaceRecognitionService
+from app.models import Course, Enrollment, Student
+from app.schemas import CurrentUser
+from app.services import attendance_service
+from app.utils.dependencies import get_current_teacher, get_current_teacher_async
+
+
+class FakeEncoder:
+    """Test encoder: the image bytes are comma-separated gallery row indexes."""
+
+    dimension = 8
+    input_format = "bytes"
+
+    def embed(self, image_bytes: bytes) -> np.ndarray:
+        return self.embed_faces(image_bytes)[0]
+
+    def embed_faces(self, image_bytes: bytes) -> np.ndarray:
+        indexes = [int(part) for part in bytes(image_bytes).decode().split(",") if part]
+        return np.eye(self.dimension, dtype=np.float32)[indexes]
+
+
+class IndexEncoder:
+    """Saved into real artifacts: the image bytes are one gallery row index of `np.eye(4)`.
+
+    Picklable by reference, so spawned workers can load the artifact too.
+    """
+
+    input_format = "bytes"
+
+    def embed(self, image_bytes: bytes) -> np.ndarray:
+        return np.eye(4, dtype=np.float32)[int(bytes(image_bytes))]
+
+
+@pytest.fixture
+def database_path(tmp_path):
+    # A file database so the sync and async (aiosqlite) engines see the same data.
+    return tmp_path / "test.db"
+
+
+@pytest.fixture
+def db_session(database_path):
+    engine = create_engine(f"sqlite:///{database_path}")
+    Base.metadata.create_all(bind=engine)
+    TestingSession = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, class_=Session)
+    # Cached ids from an earlier test's database would point at unrelated rows.
+    attendance_service.active_sessions.clear()
+    attendance_service.face_mark_keys.clear()
+    session = TestingSession()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def async_session_override(database_path, db_session):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{database_path}")
+    TestingAsyncSession = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, class_=AsyncSession)
+
+    async def override():
+        async with TestingAsyncSession() as session:
+            yield session
+
+    yield override
+    engine.sync_engine.dispose()
+
+
+@pytest.fixture
+def model_path(tmp_path, monkeypatch):
+    # Keeps enrolment journals written by student changes out of the source tree.
+    path = tmp_path / "face_recognition.bin"
+    monkeypatch.setattr("app.config.settings.face_model_path", path)
+    return path
+
+
+@pytest.fixture
+def fake_recognizer(model_path, monkeypatch):
+    service = FaceRecognitionService(model_path, threshold=0.65)
+    service.model = FakeEncoder()
+    service.gallery = EmbeddingGallery(np.eye(FakeEncoder.dimension), range(1, FakeEncoder.dimension + 1))
+    monkeypatch.setattr("app.services.ml_integration.get_recognizer", lambda timeout=None: service)
+    monkeypatch.setattr("app.services.ml_integration.loaded_recognizer", lambda: service)
+    return service
+
+
+@pytest.fixture
+def client(db_session, async_session_override, model_path, tmp_path, monkeypatch):
+    teacher = CurrentUser(id=1, email="teacher@example.com", full_name="Teacher")
+    monkeypatch.setattr("app.config.settings.media_root", tmp_path / "media")
+    app.dependency_overrides[get_session] = lambda: db_session
+    app.dependency_overrides[get_async_session] = async_session_override
+    app.dependency_overrides[get_current_teacher] = lambda: teacher
+    app.dependency_overrides[get_current_teacher_async] = lambda: teacher
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def course(db_session):
+    """A course with students 1-4 enrolled; student ids match gallery rows 0-3 plus one."""
+    course = Course(code="CS101", title="Intro", section="A")
+    students = [Student(roll_number=f"R{idx}", first_name=f"Student{idx}") for idx in range(1, 6)]
+    db_session.add_all([course, *students])
+    db_session.flush()
+    db_session.add_all([Enrollment(student_id=student.id, course_id=course.id) for student in students[:4]])
+    db_session.commit()
+    return course
@@ -0,0 +1,51 @@
+import numpy as np
+
+from app.ml import ann, artifacts
+from app.ml.gallery import EmbeddingGallery, normalize_rows
+from app.ml.recognizer import FaceRecognitionService
+
+
+class IdentityEncoder:
+    input_format = "bytes"
+
+    def embed(self, image_bytes: bytes) -> np.ndarray:
+        return np.frombuffer(bytes(image_bytes), dtype=np.float32)
+
+
+def _embeddings(rows: int = 2000, dimension: int = 16) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return normalize_rows(rng.standard_normal((rows, dimension)))
+
+
+def test_ivf_search_matches_exact_for_gallery_members():
+    embeddings = _embeddings()
+    gallery = EmbeddingGallery(embeddings, np.arange(len(embeddings)))
+    gallery.attach_index(ann.IVFIndex.build(gallery.embeddings, nlist=32, nprobe=8))
+
+    hits = [gallery.search(embeddings[row], k=1)[0][0] == row for row in range(0, 2000, 50)]
+    assert all(hits)
+
+
+def test_rows_added_after_the_index_are_still_found():
+    embeddings = _embeddings()
+    gallery = EmbeddingGallery(embeddings, np.arange(len(embeddings)))
+    gallery.attach_index(ann.IVFIndex.build(gallery.embeddings, nlist=32, nprobe=1))
+
+    query = normalize_rows(np.ones((1, 16)))[0]
+    gallery.upsert(99999, query)
+    assert gallery.search(query, k=1)[0][0] == 99999
+
+
+def test_index_is_persisted_next_to_the_model(model_path):
+    embeddings = _embeddings()
+    artifacts.save_artifact(model_path, IdentityEncoder(), embeddings, np.arange(len(embeddings)))
+    config = ann.AnnConfig(backend="ivf", min_rows=100, nlist=32, nprobe=8)
+
+    first = FaceRecognitionService(model_path, ann_config=config)
+    assert ann.index_path(model_path, "ivf").exists()
+    second = FaceRecognitionService(model_path, ann_config=config)
+
+    assert np.array_equal(first.gallery.index.rows, second.gallery.index.rows)
+    assert second.identify(embeddings[7].tobytes()).student_id == 7
+    # Course-scoped searches stay exact: partitions carry no index.
+    assert second.partition(1, [7, 8]).index is None
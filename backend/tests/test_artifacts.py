@@ -0,0 +1,97 @@
+import numpy as np
+
+from app.ml import artifacts
+from app.ml.recognizer import FaceRecognitionService
+from conftest import IndexEncoder
+
+
+def test_gallery_sidecars_are_memory_mapped(tmp_path):
+    model_path = tmp_path / "face_recognition.bin"
+    artifacts.save_artifact(model_path, IndexEncoder(), np.eye(4) * 3, [10, 11, 12, 13])
+
+    service = FaceRecognitionService(model_path, threshold=0.5)
+
+    assert service.gallery is not None
+    assert not service.gallery.embeddings.flags.writeable  # read-only pages shared between processes
+    assert np.allclose(np.linalg.norm(service.gallery.embeddings, axis=1), 1.0)
+    assert service.identify(b"2").student_id == 12
+
+
+def test_convert_moves_bundle_arrays_into_sidecars(tmp_path):
+    import joblib
+
+    model_path = tmp_path / "bundle.bin"
+    joblib.dump({"encoder": IndexEncoder(), "embeddings": np.eye(4), "student_ids": [1, 2, 3, 4]}, model_path)
+
+    artifacts.convert(model_path)
+
+    embeddings, student_ids, scales = artifacts.load_sidecars(model_path)
+    assert embeddings.dtype == np.float32 and scales is None and student_ids.tolist() == [1, 2, 3, 4]
+    assert isinstance(joblib.load(model_path), IndexEncoder)
+
+
+def test_quantize_rewrites_sidecars_as_int8(tmp_path):
+    model_path = tmp_path / "face_recognition.bin"
+    artifacts.save_artifact(model_path, IndexEncoder(), np.eye(4) * 3, [10, 11, 12, 13])
+    version = artifacts.fingerprint(model_path)
+
+    report = artifacts.quantize(model_path, "int8", threshold=0.5)
+
+    sidecars = artifacts.load_sidecars(model_path)
+    assert sidecars.dtype == "int8" and sidecars.scales.shape == (4,)
+    assert report["compression"] == 2.0 and report["decisions_flipped"] == 0  # 4 int8 + 4 scale bytes per row
+    assert artifacts.fingerprint(model_path) != version
+    service = FaceRecognitionService(model_path, threshold=0.5)
+    assert service.gallery.dtype == "int8"
+    assert service.identify(b"1").student_id == 11
+
+
+def test_compaction_restarts_readers_on_the_new_journal(tmp_path):
+    model_path = tmp_path / "face_recognition.bin"
+    artifacts.save_artifact(model_path, IndexEncoder(), np.eye(4), [1, 2, 3, 4])
+    artifacts.append_journal(model_path, "remove", 1)
+    entries, position = artifacts.read_journal(model_path)
+    assert [entry["student_id"] for entry in entries] == [1]
+
+    # Appended after this reader's position, then compacted away underneath it.
+    artifacts.append_journal(model_path, "remove", 2)
+    artifacts.compact(model_path)
+    artifacts.append_journal(model_path, "upsert", 7, np.eye(4)[[0]])
+
+    entries, position = artifacts.read_journal(model_path, position)
+    assert [(entry["op"], entry["student_id"]) for entry in entries] == [("upsert", 7)]
+    assert artifacts.read_journal(model_path, position) == ([], position)
+    assert sorted(artifacts.load_sidecars(model_path)[1].tolist()) == [3, 4]
+
+
+def test_course_partitions_are_bounded(tmp_path):
+    model_path = tmp_path / "face_recognition.bin"
+    artifacts.save_artifact(model_path, IndexEncoder(), np.eye(4), [1, 2, 3, 4])
+    service = FaceRecognitionService(model_path, threshold=0.5, partition_cache_size=2)
+
+    first = service.partition(1, [1, 2])
+    assert service.partition(1, [1, 2]) is first
+    service.partition(1, [1, 2, 3])  # a new roster replaces the course's old slice
+    service.partition(2, [3])
+    service.partition(3, [4])
+    assert len(service._partitions) == 2
+    assert service.partition(3, [4]).student_ids.tolist() == [4]
+
+
+def test_compaction_between_syncs_reloads_the_sidecars(tmp_path):
+    model_path = tmp_path / "face_recognition.bin"
+    artifacts.save_artifact(model_path, IndexEncoder(), np.eye(4)[[0, 1]], [1, 2])
+    service = FaceRecognitionService(model_path, threshold=0.5)
+
+    artifacts.append_journal(model_path, "upsert", 10, np.eye(4)[[2]])
+    service.sync_enrollments()
+    # Never replayed by this process before being folded into the sidecars.
+    artifacts.append_journal(model_path, "upsert", 11, np.eye(4)[[3]])
+    artifacts.compact(model_path)
+    service.sync_enrollments()
+
+    assert service.identify(b"3").student_id == 11
+    assert service.identify(b"2").student_id == 10
+    artifacts.append_journal(model_path, "remove", 10)
+    service.sync_enrollments()
+    assert service.identify(b"2").student_id is None
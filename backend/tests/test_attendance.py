@@ -0,0 +1,338 @@
+import base64
+import io
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+from app.utils.file_storage import image_suffix
+
+
+def _image(indexes: str) -> str:
+    return base64.b64encode(indexes.encode()).decode()
+
+
+def test_mark_face_only_matches_enrolled_students(client, course, fake_recognizer):
+    enrolled = client.post("/api/attendance/mark-face", data={"course_id": course.id, "image_base64": _image("1")})
+    assert enrolled.status_code == 200
+    assert enrolled.json()["student_id"] == 2
+
+    outsider = client.post("/api/attendance/mark-face", data={"course_id": course.id, "image_base64": _image("4")})
+    assert outsider.status_code == 200
+    assert outsider.json()["student_id"] is None
+    assert outsider.json()["status"] == "unknown"
+
+
+def test_mark_group_records_every_recognised_face(client, course, fake_recognizer):
+    response = client.post("/api/attendance/mark-group", data={"course_id": course.id, "image_base64": _image("0,2,2,4")})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["faces_detected"] == 4
+    assert sorted(body["recognized_students"]) == [1, 3]
+    assert body["unrecognized_faces"] == 2
+    assert {record["session_id"] for record in body["records"]} == {body["session_id"]}
+
+
+def test_bulk_records_insert_whole_roll(client, course):
+    session = client.post("/api/attendance/sessions", json={"course_id": course.id}).json()
+    roll = [{"session_id": session["id"], "student_id": student_id, "status": "present"} for student_id in (1, 2, 3)]
+    roll.append({"session_id": session["id"], "student_id": 4, "status": "absent"})
+
+    response = client.post("/api/attendance/records/bulk", json=roll)
+    assert response.status_code == 201
+    assert [record["student_id"] for record in response.json()] == [1, 2, 3, 4]
+    assert response.json()[3]["status"] == "absent"
+
+
+def test_bulk_records_reject_unknown_students(client, course):
+    session = client.post("/api/attendance/sessions", json={"course_id": course.id}).json()
+    response = client.post("/api/attendance/records/bulk", json=[{"session_id": session["id"], "student_id": 99}])
+    assert response.status_code == 404
+    assert "99" in response.json()["detail"]
+
+
+def test_retried_snapshot_upload_is_stored_once(client, course, fake_recognizer, tmp_path):
+    for _ in range(2):
+        response = client.post(
+            "/api/attendance/mark-face",
+            data={"course_id": course.id},
+            files={"image_file": ("frame.JPEG", b"1", "image/jpeg")},
+        )
+        assert response.status_code == 200
+
+    stored = list((tmp_path / "media" / "snapshots").rglob("*.jpg"))
+    assert len(stored) == 1
+    assert response.json()["snapshot_url"].endswith(stored[0].name)
+
+
+def test_base64_frame_is_identified_and_stored(client, course, fake_recognizer, tmp_path):
+    response = client.post(
+        "/api/attendance/mark-face",
+        data={"course_id": course.id, "image_base64": f"data:image/png;base64,{_image('2')}"},
+    )
+    assert response.status_code == 200
+    assert response.json()["student_id"] == 3
+
+    stored = list((tmp_path / "media" / "snapshots").rglob("*.png"))
+    assert len(stored) == 1
+    assert stored[0].read_bytes() == b"2"
+
+
+def test_snapshots_are_only_stored_with_image_extensions(client, course, fake_recognizer, tmp_path):
+    response = client.post(
+        "/api/attendance/mark-face",
+        data={"course_id": course.id},
+        files={"image_file": ("frame.html", b"1", "text/html")},
+    )
+    assert response.status_code == 200
+    assert response.json()["snapshot_url"].endswith(".jpg")
+
+    png = io.BytesIO()
+    Image.new("RGB", (4, 4)).save(png, format="PNG")
+    # The detected format wins over whatever the client claims.
+    assert image_suffix(png.getvalue(), ".html") == ".png"
+    assert image_suffix(b"<script>", ".svg") == ".jpg"
+
+
+def _record_roll(client, course_id, session_date, statuses):
+    session = client.post("/api/attendance/sessions", json={"course_id": course_id, "session_date": session_date}).json()
+    roll = [{"session_id": session["id"], "student_id": student_id, "status": value} for student_id, value in statuses]
+    assert client.post("/api/attendance/records/bulk", json=roll).status_code == 201
+
+
+def test_course_attendance_summary_aggregates_per_student(client, course):
+    _record_roll(client, course.id, "2024-03-01", [(1, "present"), (2, "absent"), (None, "unknown")])
+    _record_roll(client, course.id, "2024-03-08", [(1, "present"), (2, "present"), (3, "unknown")])
+
+    summary = client.get(f"/api/courses/{course.id}/attendance-summary").json()
+
+    assert [(row["student_id"], row["present"], row["absent"], row["unknown"]) for row in summary] == [
+        (1, 2, 0, 0),
+        (2, 1, 1, 0),
+        (3, 0, 0, 1),
+    ]
+    assert summary[1]["present_rate"] == 0.5 and summary[1]["total"] == 2
+
+    ranged = client.get(f"/api/courses/{course.id}/attendance-summary", params={"date_from": "2024-03-05"}).json()
+    assert [(row["student_id"], row["total"]) for row in ranged] == [(1, 1), (2, 1), (3, 1)]
+    assert client.get("/api/courses/999/attendance-summary").status_code == 404
+
+
+def test_student_attendance_summary_streams_ndjson(client, course):
+    import json
+
+    _record_roll(client, course.id, "2024-03-01", [(1, "present")])
+    _record_roll(client, course.id, "2024-03-08", [(1, "absent")])
+
+    response = client.get("/api/students/1/attendance-summary", params={"format": "ndjson", "date_to": "2024-03-31"})
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows == [
+        {
+            "course_id": course.id,
+            "student_id": 1,
+            "present": 1,
+            "absent": 1,
+            "unknown": 0,
+            "total": 2,
+            "present_rate": 0.5,
+            "absent_rate": 0.5,
+            "unknown_rate": 0.0,
+        }
+    ]
+    invalid = client.get("/api/students/1/attendance-summary", params={"date_from": "2024-04-01", "date_to": "2024-03-01"})
+    assert invalid.status_code == 400
+
+
+def _rollup(db_session):
+    from sqlalchemy import select
+
+    from app.models import AttendanceDailyRollup
+
+    db_session.expire_all()
+    rows = db_session.scalars(select(AttendanceDailyRollup))
+    return {
+        (row.session_date.isoformat(), row.student_id): (row.present, row.absent, row.unknown)
+        for row in rows
+        if row.present or row.absent or row.unknown
+    }
+
+
+def test_daily_rollup_follows_record_changes(client, course, db_session, fake_recognizer):
+    _record_roll(client, course.id, "2024-03-01", [(1, "present"), (2, "absent"), (None, "unknown")])
+    session = client.post("/api/attendance/sessions", json={"course_id": course.id, "session_date": "2024-03-08"}).json()
+    record = client.post("/api/attendance/records", json={"session_id": session["id"], "student_id": 2}).json()
+    assert _rollup(db_session) == {("2024-03-01", 1): (1, 0, 0), ("2024-03-01", 2): (0, 1, 0), ("2024-03-08", 2): (1, 0, 0)}
+
+    client.put(f"/api/attendance/records/{record['id']}", json={"status": "absent"})
+    client.put(f"/api/attendance/sessions/{session['id']}", json={"session_date": "2024-03-09"})
+    client.post(
+        "/api/attendance/mark-face", data={"course_id": course.id, "session_id": session["id"], "image_base64": _image("0")}
+    )
+    assert _rollup(db_session) == {
+        ("2024-03-01", 1): (1, 0, 0),
+        ("2024-03-01", 2): (0, 1, 0),
+        ("2024-03-09", 1): (1, 0, 0),
+        ("2024-03-09", 2): (0, 1, 0),
+    }
+
+    trend = client.get("/api/attendance/trend", params={"course_id": course.id}).json()
+    assert [(row["session_date"], row["present"], row["absent"], row["total"]) for row in trend] == [
+        ("2024-03-01", 1, 1, 2),
+        ("2024-03-09", 1, 1, 2),
+    ]
+
+    assert client.delete(f"/api/attendance/sessions/{session['id']}").status_code == 204
+    assert _rollup(db_session) == {("2024-03-01", 1): (1, 0, 0), ("2024-03-01", 2): (0, 1, 0)}
+
+
+def test_student_is_recorded_once_per_session(client, course, fake_recognizer):
+    session = client.post("/api/attendance/sessions", json={"course_id": course.id}).json()
+    first = client.post("/api/attendance/records", json={"session_id": session["id"], "student_id": 1})
+    assert first.status_code == 201
+
+    again = client.post("/api/attendance/records", json={"session_id": session["id"], "student_id": 1})
+    assert again.status_code == 409
+    twice = [{"session_id": session["id"], "student_id": 2}, {"session_id": session["id"], "student_id": 2}]
+    assert client.post("/api/attendance/records/bulk", json=twice).status_code == 409
+    unknown = [{"session_id": session["id"], "status": "unknown"}, {"session_id": session["id"], "status": "unknown"}]
+    assert client.post("/api/attendance/records/bulk", json=unknown).status_code == 201
+
+    group = client.post(
+        "/api/attendance/mark-group", data={"course_id": course.id, "session_id": session["id"], "image_base64": _image("0,1")}
+    ).json()
+    assert group["recognized_students"] == [1, 2]
+    assert [record["student_id"] for record in group["records"]] == [1, 2]
+    assert len(client.get("/api/attendance/records", params={"student_id": 1}).json()) == 1
+
+
+def test_repeat_face_scans_update_one_record(db_session, course):
+    from app.services import attendance_service
+
+    first = attendance_service.mark_face_attendance(db_session, course.id, 2, 0.7, snapshot_url="/media/a.jpg")
+    for confidence, snapshot in ((0.9, "/media/b.jpg"), (0.8, "/media/c.jpg")):
+        again = attendance_service.mark_face_attendance(
+            db_session, course.id, 2, confidence, session_id=first.session_id, snapshot_url=snapshot
+        )
+        assert again.id == first.id
+
+    assert float(again.confidence) == 0.9
+    assert again.snapshot_url == "/media/c.jpg"
+    assert _rollup(db_session) == {(again.session.session_date.isoformat(), 2): (1, 0, 0)}
+
+
+def test_group_photo_merges_into_existing_face_records(db_session, course):
+    from app.schemas import IdentifyResult
+    from app.services import attendance_service
+
+    scanned = attendance_service.mark_face_attendance(db_session, course.id, 2, 0.9, snapshot_url="/media/a.jpg")
+    matches = [
+        IdentifyResult(student_id=2, confidence=0.6, matched=True),
+        IdentifyResult(student_id=3, confidence=0.8, matched=True),
+    ]
+    session, records = attendance_service.mark_group_attendance(
+        db_session, course.id, matches, session_id=scanned.session_id, snapshot_url="/media/group.jpg"
+    )
+
+    assert [record.student_id for record in records] == [2, 3]
+    assert records[0].id == scanned.id
+    assert float(records[0].confidence) == 0.9
+    assert records[0].snapshot_url == "/media/group.jpg"
+    day = session.session_date.isoformat()
+    assert _rollup(db_session) == {(day, 2): (1, 0, 0), (day, 3): (1, 0, 0)}
+
+
+def test_idempotency_key_replays_mark_face(client, course, fake_recognizer, monkeypatch):
+    headers = {"Idempotency-Key": "scan-42"}
+    data = {"course_id": course.id, "image_base64": _image("1")}
+    first = client.post("/api/attendance/mark-face", data=data, headers=headers)
+    assert first.status_code == 200
+
+    monkeypatch.setattr(fake_recognizer, "identify_batch", lambda jobs: pytest.fail("retry was identified again"))
+    retry = client.post("/api/attendance/mark-face", data=data, headers=headers)
+    assert retry.json() == first.json()
+
+    other_course = client.post("/api/attendance/mark-face", data={**data, "course_id": 999}, headers=headers)
+    assert other_course.status_code == 422
+
+
+def test_scans_without_session_share_the_days_session(client, course, fake_recognizer):
+    sessions = {
+        client.post("/api/attendance/mark-face", data={"course_id": course.id, "image_base64": _image(index)}).json()[
+            "session_id"
+        ]
+        for index in ("0", "1", "2", "0")
+    }
+    assert len(sessions) == 1
+    listed = client.get("/api/attendance/sessions", params={"course_id": course.id}).json()
+    assert [(session["id"], session["opened_by_scan"]) for session in listed] == [(sessions.pop(), True)]
+
+    client.delete(f"/api/attendance/sessions/{listed[0]['id']}")  # also drops the cached id
+    reopened = client.post("/api/attendance/mark-face", data={"course_id": course.id, "image_base64": _image("0")})
+    assert reopened.status_code == 200
+    assert len(client.get("/api/attendance/sessions", params={"course_id": course.id}).json()) == 1
+
+
+def test_concurrent_first_scans_open_one_session(database_path, db_session, course):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from sqlalchemy import create_engine, func, select
+    from sqlalchemy.orm import Session
+
+    from app.models import AttendanceSession
+    from app.services import attendance_service
+
+    engine = create_engine(f"sqlite:///{database_path}", connect_args={"timeout": 30})
+
+    def scan(_):
+        attendance_service.active_sessions.clear()  # every worker starts cold
+        with Session(engine, expire_on_commit=False) as db:
+            session_id = attendance_service.resolve_active_session(db, course.id).id
+            db.commit()
+            return session_id
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        opened = set(pool.map(scan, range(16)))
+    engine.dispose()
+
+    assert len(opened) == 1
+    assert db_session.scalar(select(func.count()).select_from(AttendanceSession)) == 1
+
+
+def test_moving_a_scan_session_onto_another_days_scan_session_conflicts(db_session, course):
+    from datetime import date
+
+    from app.schemas import AttendanceSessionUpdate
+    from app.services import attendance_service
+
+    monday = attendance_service.resolve_active_session(db_session, course.id, date(2024, 5, 6))
+    tuesday = attendance_service.resolve_active_session(db_session, course.id, date(2024, 5, 7))
+    db_session.commit()
+
+    with pytest.raises(HTTPException) as raised:
+        attendance_service.update_session(db_session, tuesday.id, AttendanceSessionUpdate(session_date=monday.session_date))
+    assert raised.value.status_code == 409
+    assert attendance_service.get_session_or_404(db_session, tuesday.id).session_date == date(2024, 5, 7)
+
+
+def test_cached_session_moved_elsewhere_is_not_reused(db_session, course):
+    from datetime import date
+
+    from sqlalchemy import update
+
+    from app.models import AttendanceSession
+    from app.services import attendance_service
+
+    monday = attendance_service.resolve_active_session(db_session, course.id, date(2024, 5, 6))
+    db_session.commit()
+    # Another process moves the session; this process's cache still points at it.
+    db_session.execute(
+        update(AttendanceSession).where(AttendanceSession.id == monday.id).values(session_date=date(2024, 5, 8))
+    )
+    db_session.commit()
+    db_session.expire_all()
+
+    reopened = attendance_service.resolve_active_session(db_session, course.id, date(2024, 5, 6))
+    assert reopened.id != monday.id
+    assert reopened.session_date == date(2024, 5, 6)
@@ -0,0 +1,36 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import get_async_session, get_session
+from app.main import app
+from app.models import Teacher
+from app.schemas import TeacherUpdate
+from app.services import teacher_service
+from app.services.auth_service import principal_cache
+from app.utils.security import create_access_token
+
+
+@pytest.fixture
+def auth_client(db_session, async_session_override):
+    principal_cache.clear()
+    db_session.add(Teacher(full_name="Alice", email="alice@example.com", hashed_password="x"))
+    db_session.commit()
+    app.dependency_overrides[get_session] = lambda: db_session
+    app.dependency_overrides[get_async_session] = async_session_override
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+        principal_cache.clear()
+
+
+def test_token_principal_is_cached_until_teacher_changes(auth_client, db_session):
+    headers = {"Authorization": f"Bearer {create_access_token(subject='alice@example.com')}"}
+    hits = principal_cache.hits
+
+    assert auth_client.get("/api/courses/", headers=headers).status_code == 200
+    assert auth_client.get("/api/attendance/sessions", headers=headers).status_code == 200
+    assert principal_cache.hits == hits + 1
+
+    teacher_service.update_teacher(db_session, 1, TeacherUpdate(full_name="Alice B."))
+    assert len(principal_cache) == 0
@@ -0,0 +1,36 @@
+import asyncio
+
+from app.ml.batching import MicroBatcher
+
+def test_concurrent_jobs_share_one_handler_call():
+    calls = []
+
+    def handler(jobs):
+        calls.append(list(jobs))
+        return [ValueError("bad") if job < 0 else job * 2 for job in jobs]
+
+    async def scenario():
+        batcher = MicroBatcher(handler, max_batch_size=8, max_wait_ms=20)
+        results = await asyncio.gather(*(batcher.submit(job) for job in (1, 2, -1, 3)), return_exceptions=True)
+        await batcher.aclose()
+        return results
+
+    results = asyncio.run(scenario())
+    assert results[:2] == [2, 4] and results[3] == 6
+    assert isinstance(results[2], ValueError)
+    assert calls == [[1, 2, -1, 3]]
+
+def test_batches_are_capped_at_max_size():
+    sizes = []
+
+    def handler(jobs):
+        sizes.append(len(jobs))
+        return list(jobs)
+
+    async def scenario():
+        batcher = MicroBatcher(handler, max_batch_size=2, max_wait_ms=20)
+        await asyncio.gather(*(batcher.submit(job) for job in range(5)))
+        await batcher.aclose()
+
+    asyncio.run(scenario())
+    assert sizes == [2, 2, 1]
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from app.ml.gallery import EmbeddingGallery
+from app.ml.quantization import quantization_report
+
+
+def _gallery():
+    embeddings = np.array(
+        [
+            [1.0, 0.0, 0.0],
+            [0.9, 0.1, 0.0],
+            [0.0, 1.0, 0.0],
+            [0.0, 0.0, 2.0],
+        ]
+    )
+    return EmbeddingGallery(embeddings, [1, 1, 2, 3])
+
+
+def test_gallery_rows_are_normalized():
+    gallery = _gallery()
+    assert gallery.embeddings.dtype == np.float32
+    assert np.allclose(np.linalg.norm(gallery.embeddings, axis=1), 1.0)
+
+
+def test_search_returns_distinct_students_best_first():
+    matches = _gallery().search(np.array([1.0, 0.05, 0.0]), k=3)
+    assert [student_id for student_id, _ in matches] == [1, 2, 3]
+    assert matches[0][1] > matches[1][1]
+
+
+def test_search_applies_threshold():
+    matches = _gallery().search(np.array([0.0, 0.0, 1.0]), k=3, threshold=0.5)
+    assert matches == [(3, 1.0)]
+
+
+def test_search_batch_scores_every_query():
+    results = _gallery().search_batch(np.eye(3), k=1)
+    assert [result[0][0] for result in results] == [1, 2, 3]
+
+
+def test_subset_restricts_search_to_roster():
+    roster = _gallery().subset([2, 3])
+    assert len(roster) == 2
+    assert roster.search(np.array([1.0, 0.0, 0.0]), k=1, threshold=0.5) == []
+
+
+def test_upsert_replaces_one_students_rows():
+    gallery = _gallery()
+    gallery.upsert(1, np.array([[0.0, 0.0, 1.0]]))
+
+    assert len(gallery) == 3
+    assert gallery.search(np.array([0.0, 0.0, 1.0]), k=1)[0][0] in {1, 3}
+    assert [student_id for student_id, _ in gallery.search(np.array([1.0, 0.0, 0.0]), k=3, threshold=0.5)] == []
+
+
+def test_remove_tombstones_rows_and_compacts():
+    gallery = EmbeddingGallery(np.eye(3)[np.arange(300) % 3], np.arange(300))
+    for student_id in range(100):
+        assert gallery.remove(student_id) == 1
+
+    assert len(gallery) == 200
+    assert gallery.student_ids.shape[0] < 300  # compacted once a quarter of the rows were tombstones
+    assert 5 not in gallery.subset([5, 150]).student_ids
+
+
+def test_changes_copy_a_read_only_gallery_once():
+    embeddings = np.eye(3, dtype=np.float32)
+    embeddings.setflags(write=False)  # as with a memory-mapped sidecar
+    gallery = EmbeddingGallery(embeddings, [1, 2, 3], normalized=True)
+
+    gallery.upsert(4, np.array([1.0, 1.0, 0.0]))
+
+    assert gallery.embeddings.flags.writeable
+    assert embeddings.tolist() == np.eye(3).tolist()  # the shared source is untouched
+    assert gallery.search(np.array([1.0, 1.0, 0.0]), k=1)[0][0] == 4
+
+
+def test_compact_dtypes_rank_like_float32():
+    rng = np.random.default_rng(7)
+    embeddings = rng.standard_normal((500, 128))
+    queries = embeddings[:20] + 0.3 * rng.standard_normal((20, 128))
+    exact = EmbeddingGallery(embeddings, np.arange(500))
+
+    for dtype, compression in (("float16", 2), ("int8", 3.9)):
+        gallery = EmbeddingGallery(embeddings, np.arange(500), dtype=dtype)
+        gallery.upsert(1000, embeddings[0])
+
+        assert gallery.nbytes < exact.nbytes / compression * 1.01  # one extra row was upserted
+        for expected, ranked in zip(exact.search_batch(queries, k=1), gallery.search_batch(queries, k=1)):
+            assert ranked[0][1] == pytest.approx(expected[0][1], abs=0.01)
+
+
+def test_quantization_report_counts_threshold_flips():
+    embeddings = np.random.default_rng(3).standard_normal((300, 64))
+
+    float16 = quantization_report(embeddings, "float16", threshold=0.65)
+    int8 = quantization_report(embeddings, "int8", threshold=0.65)
+
+    assert float16["compression"] == 2.0 and int8["compression"] > 3.5
+    assert float16["max_abs_score_error"] < int8["max_abs_score_error"] < 0.02
+    assert int8["decisions"] == 256 * 300 and int8["top1_agreement"] > 0.99
@@ -9,3 +9,11 @@ def test_health_live():
     response = client.get("/api/health/live")
     assert response.status_code == 200
     assert response.json()["status"] == "ok"
+
+
+def test_health_metrics_report_caches_and_pools():
+    body = client.get("/api/health/metrics").json()
+    assert {"hits", "misses", "evictions"} <= set(body["auth_cache"])
+    assert {"hit_rate", "evictions"} <= set(body["recognition_cache"])
+    assert {"sync", "async"} == set(body["db_pool"])
+    assert "histogram" in body["db_pool"]["sync"]["wait_seconds"]
@@ -0,0 +1,27 @@
+import threading
+
+import app.ml.recognizer as recognizer_module
+
+
+def test_ml_endpoints_wait_for_background_model_load(client, monkeypatch):
+    release = threading.Event()
+
+    def slow_build():
+        release.wait(5)
+        return recognizer_module.FaceRecognitionService(recognizer_module.Path("missing-model.bin"))
+
+    monkeypatch.setattr(recognizer_module, "_build_recognizer", slow_build)
+    monkeypatch.setattr(recognizer_module, "_load_future", None)
+    monkeypatch.setattr("app.config.settings.face_model_load_wait_seconds", 0.05)
+
+    recognizer_module.load_recognizer()
+    assert client.get("/api/health/ready").json()["model"]["state"] == "loading"
+
+    response = client.post("/api/ml/identify", data={"image_base64": "MQ=="})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+    release.set()
+    recognizer_module.load_recognizer().result(5)
+    assert client.get("/api/health/ready").json()["model"]["state"] == "ready"
+    assert client.post("/api/ml/identify", data={"image_base64": "MQ=="}).status_code == 200
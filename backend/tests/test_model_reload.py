@@ -0,0 +1,37 @@
+import numpy as np
+
+import app.ml.recognizer as recognizer_module
+from app.ml import artifacts
+from conftest import IndexEncoder
+
+
+def test_reload_swaps_in_the_new_artifact(client, tmp_path, monkeypatch):
+    model_path = tmp_path / "face_recognition.bin"
+    artifacts.save_artifact(model_path, IndexEncoder(), np.eye(4), [1, 2, 3, 4])
+    monkeypatch.setattr("app.config.settings.face_model_path", model_path)
+    monkeypatch.setattr(recognizer_module, "_load_future", None)
+
+    before = recognizer_module.get_recognizer(timeout=5)
+    artifacts.save_artifact(model_path, IndexEncoder(), np.eye(4), [5, 6, 7, 8])
+
+    response = client.post("/api/ml/reload")
+    assert response.status_code == 200
+    assert response.json()["version"] == artifacts.fingerprint(model_path)
+
+    after = recognizer_module.get_recognizer()
+    assert after is not before
+    assert after.identify(b"0").student_id == 5
+    # The previous instance stays usable for identifications already in flight.
+    assert before.identify(b"0").student_id == 1
+
+
+def test_failed_reload_keeps_the_previous_model(client, monkeypatch):
+    monkeypatch.setattr(recognizer_module, "_load_future", None)
+    current = recognizer_module.get_recognizer(timeout=5)
+
+    def broken():
+        raise recognizer_module.ModelNotLoadedError("corrupt artifact")
+
+    monkeypatch.setattr(recognizer_module, "_build_recognizer", broken)
+    assert client.post("/api/ml/reload").status_code == 500
+    assert recognizer_module.get_recognizer() is current
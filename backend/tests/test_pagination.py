@@ -0,0 +1,45 @@
+import base64
+import json
+
+import pytest
+
+from app.utils.pagination import NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER
+
+
+def test_students_are_paged_with_cursor(client, course):
+    first = client.get("/api/students/", params={"page_size": 2, "include_total": True})
+    assert [student["id"] for student in first.json()] == [1, 2]
+    assert first.headers[TOTAL_COUNT_HEADER] == "5"
+
+    second = client.get("/api/students/", params={"page_size": 2, "cursor": first.headers[NEXT_CURSOR_HEADER]})
+    assert [student["id"] for student in second.json()] == [3, 4]
+
+    last = client.get("/api/students/", params={"page_size": 2, "cursor": second.headers[NEXT_CURSOR_HEADER]})
+    assert [student["id"] for student in last.json()] == [5]
+    assert NEXT_CURSOR_HEADER not in last.headers
+
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get("/api/courses/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_attendance_sessions_are_paged_newest_first(client, course):
+    created = [
+        client.post("/api/attendance/sessions", json={"course_id": course.id, "session_date": f"2024-05-0{day}"}).json()
+        for day in (1, 2, 3)
+    ]
+    newest = [session["id"] for session in reversed(created)]
+
+    first = client.get("/api/attendance/sessions", params={"page_size": 2})
+    assert [session["id"] for session in first.json()] == newest[:2]
+    cursor = first.headers[NEXT_CURSOR_HEADER]
+    second = client.get("/api/attendance/sessions", params={"page_size": 2, "cursor": cursor})
+    assert [session["id"] for session in second.json()] == newest[2:]
+
+
+@pytest.mark.parametrize("value", ["1 OR 1=1", True, 1.5, None, [1]])
+def test_cursor_must_hold_an_integer_key(client, value):
+    cursor = base64.urlsafe_b64encode(json.dumps({"k": value}).encode()).decode()
+    response = client.get("/api/attendance/records", params={"cursor": cursor})
+    assert response.status_code == 400
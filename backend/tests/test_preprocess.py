@@ -0,0 +1,59 @@
+import io
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.ml import preprocess
+from app.ml.gallery import EmbeddingGallery
+from app.ml.recognizer import FaceRecognitionService, IdentifyJob
+
+ORIENTATION_TAG = 0x0112
+
+
+def _jpeg(width: int, height: int, orientation: int | None = None) -> bytes:
+    image = Image.new("RGB", (width, height), (200, 30, 30))
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[ORIENTATION_TAG] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+def test_face_input_has_fixed_shape():
+    array = preprocess.face_input(_jpeg(4000, 3000), 160)
+    assert array.shape == (160, 160, 3)
+    assert array.dtype == np.uint8
+
+
+def test_scene_input_is_upright_and_downscaled():
+    # Orientation 6: stored landscape, displayed rotated into portrait.
+    array = preprocess.scene_input(_jpeg(4000, 3000, orientation=6), 1600)
+    assert array.shape == (1600, 1200, 3)
+
+
+def test_corrupt_image_is_rejected():
+    with pytest.raises(ValueError):
+        preprocess.face_input(b"not an image", 160)
+
+
+class ArrayEncoder:
+    def __init__(self):
+        self.shapes = []
+
+    def embed_batch(self, images: np.ndarray) -> np.ndarray:
+        self.shapes.append(images.shape)
+        return np.tile(np.eye(4, dtype=np.float32)[0], (len(images), 1))
+
+
+def test_batched_frames_reach_the_encoder_as_one_tensor():
+    service = FaceRecognitionService(Path("missing-model.bin"), input_size=32)
+    service.model = ArrayEncoder()
+    service.gallery = EmbeddingGallery(np.eye(4), [1, 2, 3, 4])
+
+    results = service.identify_batch([IdentifyJob(_jpeg(640, 480)), IdentifyJob(b"broken")])
+    assert service.model.shapes == [(1, 32, 32, 3)]
+    assert results[0].student_id == 1
+    assert isinstance(results[1], ValueError)
@@ -0,0 +1,26 @@
+from sqlalchemy import text
+
+from app.models import AttendanceRecord, AttendanceSession
+from app.services import attendance_service
+
+
+def _plan(db_session, query) -> str:
+    statement = query.statement.compile(db_session.get_bind(), compile_kwargs={"literal_binds": True})
+    rows = db_session.execute(text(f"EXPLAIN QUERY PLAN {statement}"))
+    return "\n".join(row.detail for row in rows)
+
+
+def test_records_by_session_use_the_unique_session_student_index(db_session):
+    plan = _plan(db_session, attendance_service.list_records(db_session, session_id=1).order_by(AttendanceRecord.id))
+    assert "INDEX sqlite_autoindex_attendance_records_1 (session_id=?)" in plan
+    assert "SCAN attendance_records" not in plan
+
+
+def test_records_by_student_use_the_student_history_index(db_session):
+    plan = _plan(db_session, attendance_service.list_records(db_session, student_id=1).order_by(AttendanceRecord.id))
+    assert "INDEX ix_attendance_records_student_created (student_id=?)" in plan
+
+
+def test_sessions_by_course_use_the_course_date_index(db_session):
+    query = attendance_service.list_sessions(db_session, course_id=1).order_by(AttendanceSession.id)
+    assert "INDEX ix_attendance_sessions_course_date (course_id=?)" in _plan(db_session, query)
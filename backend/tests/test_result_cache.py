@@ -0,0 +1,60 @@
+import asyncio
+import io
+
+from PIL import Image, ImageDraw
+
+from app.ml.result_cache import RecognitionCache, content_key
+from app.schemas import IdentifyResult
+from app.services import ml_integration
+
+
+def _frame(quality: int = 90, offset: int = 0) -> bytes:
+    image = Image.new("RGB", (640, 480), (40, 40, 40))
+    ImageDraw.Draw(image).ellipse((200 + offset, 100, 440 + offset, 400), fill=(220, 180, 150))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def test_cache_is_scoped_by_roster():
+    cache = RecognitionCache(maxsize=8, ttl=60)
+    result = IdentifyResult(matched=True, student_id=3, confidence=0.9)
+    cache.set((1, frozenset({3})), content_key(_frame()), result)
+
+    assert cache.get((1, frozenset({3})), content_key(_frame())) == result
+    assert cache.get((2, frozenset({3})), content_key(_frame())) is None
+    assert cache.stats()["hits"] == 1
+
+
+def _scanner(monkeypatch, results):
+    calls = []
+
+    async def submit(job):
+        calls.append(job)
+        return results[len(calls) - 1]
+
+    monkeypatch.setattr(ml_integration, "result_cache", RecognitionCache(maxsize=8, ttl=60))
+    monkeypatch.setattr(ml_integration.identify_batcher, "submit", submit)
+
+    def scan(data: bytes) -> IdentifyResult:
+        return asyncio.run(ml_integration.identify_image(ml_integration.ImageInput(data, ".jpg"), course_id=1))
+
+    return scan, calls
+
+
+def test_retried_upload_skips_inference(monkeypatch):
+    scan, calls = _scanner(monkeypatch, [IdentifyResult(matched=True, student_id=7, confidence=0.9)])
+
+    assert scan(_frame()) == scan(_frame())
+    assert len(calls) == 1
+
+
+def test_similar_frames_are_identified_separately(monkeypatch):
+    first = IdentifyResult(matched=True, student_id=7, confidence=0.9)
+    second = IdentifyResult(matched=True, student_id=8, confidence=0.9)
+    scan, calls = _scanner(monkeypatch, [first, second])
+
+    # Visually close frames of two different people must never share a result.
+    assert scan(_frame(90)) == first
+    assert scan(_frame(90, offset=2)) == second
+    assert len(calls) == 2
@@ -0,0 +1,71 @@
+from sqlalchemy import create_engine, inspect, text
+
+from app.db.schema import upgrade_schema
+
+# Tables as `create_all` built them before sessions were tagged by scans and
+# records were limited to one per student and session.
+LEGACY_SCHEMA = [
+    "CREATE TABLE courses (id INTEGER PRIMARY KEY, code VARCHAR(50) NOT NULL, title VARCHAR(255) NOT NULL, "
+    "section VARCHAR(50), created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, "
+    "updated_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL)",
+    "CREATE TABLE students (id INTEGER PRIMARY KEY, roll_number VARCHAR(64) NOT NULL UNIQUE, "
+    "first_name VARCHAR(120) NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, "
+    "updated_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL)",
+    "CREATE TABLE attendance_sessions (id INTEGER PRIMARY KEY, course_id INTEGER NOT NULL, session_date DATE NOT NULL, "
+    "started_at DATETIME, notes TEXT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, "
+    "updated_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL)",
+    "CREATE TABLE attendance_records (id INTEGER PRIMARY KEY, session_id INTEGER NOT NULL, student_id INTEGER, "
+    "status VARCHAR(7) NOT NULL, confidence NUMERIC(5, 4), payload TEXT, snapshot_url VARCHAR(500), "
+    "created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL)",
+    "INSERT INTO courses (id, code, title) VALUES (1, 'CS101', 'Intro')",
+    "INSERT INTO students (id, roll_number, first_name) VALUES (1, 'R1', 'Ada')",
+    "INSERT INTO attendance_sessions (id, course_id, session_date) VALUES (1, 1, '2024-05-06')",
+]
+
+
+def _legacy_engine(tmp_path, *statements):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        for statement in (*LEGACY_SCHEMA, *statements):
+            connection.execute(text(statement))
+    return engine
+
+
+def test_upgrade_adds_scan_sessions_to_a_legacy_database(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    upgrade_schema(engine)
+    upgrade_schema(engine)  # a second start finds nothing left to do
+
+    inspector = inspect(engine)
+    assert "opened_by_scan" in {column["name"] for column in inspector.get_columns("attendance_sessions")}
+    assert {"uq_attendance_sessions_scan", "ix_attendance_sessions_course_date"} <= {
+        index["name"] for index in inspector.get_indexes("attendance_sessions")
+    }
+    with engine.connect() as connection:
+        assert connection.scalar(text("SELECT opened_by_scan FROM attendance_sessions WHERE id = 1")) == 0
+    engine.dispose()
+
+
+def test_upgrade_deduplicates_records_and_backfills_rollups(tmp_path):
+    engine = _legacy_engine(
+        tmp_path,
+        "INSERT INTO attendance_records (id, session_id, student_id, status) VALUES (1, 1, 1, 'absent')",
+        "INSERT INTO attendance_records (id, session_id, student_id, status) VALUES (2, 1, 1, 'present')",
+        "INSERT INTO attendance_records (id, session_id, student_id, status) VALUES (3, 1, NULL, 'unknown')",
+        "INSERT INTO attendance_records (id, session_id, student_id, status) VALUES (4, 1, NULL, 'unknown')",
+    )
+    upgrade_schema(engine)
+
+    with engine.begin() as connection:
+        assert connection.execute(text("SELECT id FROM attendance_records ORDER BY id")).scalars().all() == [1, 3, 4]
+        rollups = connection.execute(text("SELECT * FROM attendance_daily_rollups")).all()
+        assert rollups == [(1, "2024-05-06", 1, 0, 1, 0)]
+        # mark-face's upsert needs a unique index on exactly these columns.
+        connection.execute(
+            text(
+                "INSERT INTO attendance_records (session_id, student_id, status) VALUES (1, 1, 'present') "
+                "ON CONFLICT (session_id, student_id) DO NOTHING"
+            )
+        )
+        assert connection.scalar(text("SELECT COUNT(*) FROM attendance_records")) == 3
+    engine.dispose()
@@ -0,0 +1,56 @@
+import numpy as np
+
+from app.ml import artifacts
+from app.ml.recognizer import FaceRecognitionService
+from conftest import IndexEncoder
+
+
+def test_register_enrolls_photos_into_the_gallery(client, fake_recognizer, model_path):
+    response = client.post(
+        "/api/students/register",
+        data={"roll_number": "R42", "first_name": "Ada"},
+        files=[("images", ("a.jpg", b"6", "image/jpeg")), ("images", ("b.jpg", b"7", "image/jpeg"))],
+    )
+    assert response.status_code == 201
+    student_id = response.json()["id"]
+
+    rows = fake_recognizer.gallery.subset([student_id]).embeddings
+    assert rows.tolist() == np.eye(8)[[6, 7]].tolist()
+    # The change is journaled so worker processes, other API processes and restarts replay it.
+    assert artifacts.read_journal(model_path)[0][0]["student_id"] == student_id
+
+
+def test_register_is_undone_when_the_journal_cannot_be_written(client, fake_recognizer, model_path, monkeypatch):
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(artifacts, "append_journal", fail)
+    response = client.post(
+        "/api/students/register",
+        data={"roll_number": "R43", "first_name": "Ada"},
+        files=[("images", ("a.jpg", b"6", "image/jpeg"))],
+    )
+    assert response.status_code == 500
+    assert all(student["roll_number"] != "R43" for student in client.get("/api/students/").json())
+
+
+def test_face_replacement_and_student_delete_update_the_gallery(client, course, fake_recognizer):
+    response = client.put("/api/students/1/faces", files=[("images", ("a.jpg", b"5", "image/jpeg"))])
+    assert response.json() == {"student_id": 1, "embeddings": 1}
+    assert fake_recognizer.gallery.subset([1]).embeddings.tolist() == [np.eye(8)[5].tolist()]
+
+    assert client.delete("/api/students/2").status_code == 204
+    assert len(fake_recognizer.gallery.subset([2])) == 0
+
+
+def test_journal_is_replayed_on_load_and_compacted(model_path):
+    artifacts.save_artifact(model_path, IndexEncoder(), np.eye(4), [1, 2, 3, 4])
+    artifacts.append_journal(model_path, "upsert", 9, np.eye(4)[[0]])
+    artifacts.append_journal(model_path, "remove", 1)
+
+    service = FaceRecognitionService(model_path, threshold=0.5)
+    assert service.identify(b"0").student_id == 9
+
+    artifacts.compact(model_path)
+    assert artifacts.read_journal(model_path)[0] == []
+    assert sorted(artifacts.load_sidecars(model_path)[1].tolist()) == [2, 3, 4, 9]
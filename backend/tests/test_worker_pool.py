@@ -0,0 +1,43 @@
+import base64
+
+import numpy as np
+
+from app.ml import artifacts, worker_pool
+from app.ml.result_cache import RecognitionCache
+from app.services import ml_integration
+from conftest import IndexEncoder
+
+
+def _identify(client, index: str) -> int | None:
+    response = client.post("/api/ml/identify", data={"image_base64": base64.b64encode(index.encode()).decode()})
+    assert response.status_code == 200
+    return response.json()["student_id"]
+
+
+def test_pool_warms_every_worker_then_identifies_and_reloads(client, model_path, monkeypatch):
+    artifacts.save_artifact(model_path, IndexEncoder(), np.eye(4), [1, 2, 3, 4])
+    # Spawned workers read their settings from the environment, not this process's patched object.
+    monkeypatch.setenv("FACE_MODEL_PATH", str(model_path))
+    monkeypatch.setattr("app.config.settings.recognition_workers", 2)
+    pool = worker_pool.create_recognition_pool(2)
+    monkeypatch.setattr(ml_integration, "recognition_pool", pool)
+    monkeypatch.setattr(ml_integration, "_workers_ready", None)
+    monkeypatch.setattr(ml_integration, "_workers_version", None)
+    monkeypatch.setattr(ml_integration, "result_cache", RecognitionCache(maxsize=0))
+    monkeypatch.setattr(ml_integration.identify_batcher, "handler", worker_pool.identify_batch)
+    monkeypatch.setattr(ml_integration.identify_batcher, "executor", pool)
+    try:
+        ml_integration._model_future().result(timeout=120)
+        # The initializer barrier means readiness covers both workers, not just the first to answer.
+        assert len(pool._processes) == 2
+        assert ml_integration.model_status()["state"] == "ready"
+        assert _identify(client, "2") == 3
+
+        artifacts.save_artifact(model_path, IndexEncoder(), np.eye(4), [5, 6, 7, 8])
+        assert client.post("/api/ml/reload").status_code == 200
+        assert ml_integration.recognition_pool is not pool
+        assert len(ml_integration.recognition_pool._processes) == 2
+        assert _identify(client, "2") == 7
+    finally:
+        ml_integration.recognition_pool.shutdown(cancel_futures=True)
+        pool.shutdown(cancel_futures=True)
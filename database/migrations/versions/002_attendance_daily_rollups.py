@@ -0,0 +1,41 @@
+"""Daily attendance rollup table, backfilled from existing records."""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "002_attendance_daily_rollups"
+down_revision = "001_initial"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "attendance_daily_rollups",
+        sa.Column("course_id", sa.Integer(), sa.ForeignKey("courses.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("session_date", sa.Date(), primary_key=True),
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("students.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("present", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("absent", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("unknown", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.create_index("ix_attendance_daily_rollups_student_date", "attendance_daily_rollups", ["student_id", "session_date"])
+    op.execute(
+        """
+        INSERT INTO attendance_daily_rollups (course_id, session_date, student_id, present, absent, unknown)
+        SELECT s.course_id, s.session_date, r.student_id,
+               COUNT(*) FILTER (WHERE r.status = 'present'),
+               COUNT(*) FILTER (WHERE r.status = 'absent'),
+               COUNT(*) FILTER (WHERE r.status = 'unknown')
+        FROM attendance_records r
+        JOIN attendance_sessions s ON s.id = r.session_id
+        WHERE r.student_id IS NOT NULL
+        GROUP BY s.course_id, s.session_date, r.student_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_attendance_daily_rollups_student_date", table_name="attendance_daily_rollups")
+    op.drop_table("attendance_daily_rollups")
@@ -0,0 +1,48 @@
+"""Indexes for attendance lookups and one record per student per session."""
+from __future__ import annotations
+
+from alembic import op
+
+revision = "003_attendance_indexes"
+down_revision = "002_attendance_daily_rollups"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Keep the first mark of a student in a session and drop later duplicates, then
+    # rebuild the rollup, which counted them.
+    op.execute(
+        """
+        DELETE FROM attendance_records r
+        USING attendance_records kept
+        WHERE r.session_id = kept.session_id
+          AND r.student_id = kept.student_id
+          AND r.id > kept.id
+        """
+    )
+    op.execute("DELETE FROM attendance_daily_rollups")
+    op.execute(
+        """
+        INSERT INTO attendance_daily_rollups (course_id, session_date, student_id, present, absent, unknown)
+        SELECT s.course_id, s.session_date, r.student_id,
+               COUNT(*) FILTER (WHERE r.status = 'present'),
+               COUNT(*) FILTER (WHERE r.status = 'absent'),
+               COUNT(*) FILTER (WHERE r.status = 'unknown')
+        FROM attendance_records r
+        JOIN attendance_sessions s ON s.id = r.session_id
+        WHERE r.student_id IS NOT NULL
+        GROUP BY s.course_id, s.session_date, r.student_id
+        """
+    )
+
+    # The unique constraint's index also serves lookups by session_id alone.
+    op.create_unique_constraint("uq_attendance_session_student", "attendance_records", ["session_id", "student_id"])
+    op.create_index("ix_attendance_records_student_created", "attendance_records", ["student_id", "created_at"])
+    op.create_index("ix_attendance_sessions_course_date", "attendance_sessions", ["course_id", "session_date"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_attendance_sessions_course_date", table_name="attendance_sessions")
+    op.drop_index("ix_attendance_records_student_created", table_name="attendance_records")
+    op.drop_constraint("uq_attendance_session_student", "attendance_records", type_="unique")
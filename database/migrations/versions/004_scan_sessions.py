@@ -0,0 +1,29 @@
+"""Mark sessions opened by face scans; one such session per course and day."""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "004_scan_sessions"
+down_revision = "003_attendance_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "attendance_sessions",
+        sa.Column("opened_by_scan", sa.Boolean(), server_default=sa.text("false"), nullable=False),
+    )
+    op.create_index(
+        "uq_attendance_sessions_scan",
+        "attendance_sessions",
+        ["course_id", "session_date"],
+        unique=True,
+        postgresql_where=sa.text("opened_by_scan"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_attendance_sessions_scan", table_name="attendance_sessions")
+    op.drop_column("attendance_sessions", "opened_by_scan")
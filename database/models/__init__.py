@@ -24,6 +24,7 @@ from .teacher import Teacher  # noqa: E402,F401
 from .course import Course, Enrollment  # noqa: E402,F401
 from .attendance_session import AttendanceSession  # noqa: E402,F401
 from .attendance_record import AttendanceRecord, AttendanceStatus  # noqa: E402,F401
+from .attendance_rollup import AttendanceDailyRollup  # noqa: E402,F401
 
 __all__ = [
     "TimestampMixin",
@@ -34,4 +35,5 @@ __all__ = [
     "AttendanceSession",
     "AttendanceRecord",
     "AttendanceStatus",
+    "AttendanceDailyRollup",
 ]
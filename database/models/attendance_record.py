@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from enum import Enum as PyEnum
 
-from sqlalchemy import Enum as SAEnum, ForeignKey, Numeric, String, Text
+from sqlalchemy import Enum as SAEnum, ForeignKey, Index, Numeric, String, Text, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from ..utils.base import Base
@@ -17,6 +17,10 @@ class AttendanceStatus(str, PyEnum):
 
 class AttendanceRecord(TimestampMixin, Base):
     __tablename__ = "attendance_records"
+    __table_args__ = (
+        UniqueConstraint("session_id", "student_id", name="uq_attendance_session_student"),
+        Index("ix_attendance_records_student_created", "student_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     session_id: Mapped[int] = mapped_column(ForeignKey("attendance_sessions.id", ondelete="CASCADE"))
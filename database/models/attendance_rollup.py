@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from datetime import date
+
+from sqlalchemy import Date, ForeignKey, Index, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..utils.base import Base
+
+
+class AttendanceDailyRollup(Base):
+    """Per course, day and student record counts; see `database.rollups` for backfill and checks."""
+
+    __tablename__ = "attendance_daily_rollups"
+    __table_args__ = (Index("ix_attendance_daily_rollups_student_date", "student_id", "session_date"),)
+
+    course_id: Mapped[int] = mapped_column(ForeignKey("courses.id", ondelete="CASCADE"), primary_key=True)
+    session_date: Mapped[date] = mapped_column(Date, primary_key=True)
+    student_id: Mapped[int] = mapped_column(ForeignKey("students.id", ondelete="CASCADE"), primary_key=True)
+    present: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    absent: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    unknown: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
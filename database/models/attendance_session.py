@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import date, datetime
 
-from sqlalchemy import Date, DateTime, ForeignKey, Text
+from sqlalchemy import Boolean, Date, DateTime, ForeignKey, Index, Text, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from ..utils.base import Base
@@ -11,12 +11,23 @@ from . import TimestampMixin
 
 class AttendanceSession(TimestampMixin, Base):
     __tablename__ = "attendance_sessions"
+    __table_args__ = (
+        Index("ix_attendance_sessions_course_date", "course_id", "session_date"),
+        Index(
+            "uq_attendance_sessions_scan",
+            "course_id",
+            "session_date",
+            unique=True,
+            postgresql_where=text("opened_by_scan"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     course_id: Mapped[int] = mapped_column(ForeignKey("courses.id", ondelete="CASCADE"))
     session_date: Mapped[date] = mapped_column(Date, default=date.today, nullable=False)
     started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     notes: Mapped[str | None] = mapped_column(Text)
+    opened_by_scan: Mapped[bool] = mapped_column(Boolean, server_default=text("false"), nullable=False)
 
     course = relationship("Course", back_populates="sessions")
     records = relationship("AttendanceRecord", back_populates="session", cascade="all, delete-orphan")
@@ -0,0 +1,87 @@
+"""Backfill and verify the attendance_daily_rollups table.
+
+The API keeps the rollup up to date as records change; use this module to
+populate it for existing data or after bulk edits made outside the API, and
+to confirm it still matches attendance_records:
+
+    python -m database.rollups backfill [--course-id ID]
+    python -m database.rollups check
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+
+from sqlalchemy import Select, delete, except_, func, insert, or_, select, text
+from sqlalchemy.orm import Session
+
+from database.connection import session_scope
+from database.models import AttendanceDailyRollup, AttendanceRecord, AttendanceSession, AttendanceStatus
+
+STATUS_COLUMNS = tuple(value.value for value in AttendanceStatus)
+
+
+def raw_counts(course_id: int | None = None) -> Select:
+    """What the rollup should contain, aggregated from attendance_records."""
+    counts = [func.count().filter(AttendanceRecord.status == value).label(value.value) for value in AttendanceStatus]
+    statement = (
+        select(AttendanceSession.course_id, AttendanceSession.session_date, AttendanceRecord.student_id, *counts)
+        .join(AttendanceSession, AttendanceRecord.session_id == AttendanceSession.id)
+        .where(AttendanceRecord.student_id.is_not(None))
+        .group_by(AttendanceSession.course_id, AttendanceSession.session_date, AttendanceRecord.student_id)
+    )
+    if course_id is not None:
+        statement = statement.where(AttendanceSession.course_id == course_id)
+    return statement
+
+
+def backfill(session: Session, course_id: int | None = None) -> int:
+    """Rebuild the rollup (for one course or all) from the raw records; returns the rows written."""
+    if session.get_bind().dialect.name == "postgresql":
+        # Block record writes until commit so none land between the rebuild's read and its write.
+        session.execute(text("LOCK TABLE attendance_records IN SHARE MODE"))
+    clear = delete(AttendanceDailyRollup)
+    if course_id is not None:
+        clear = clear.where(AttendanceDailyRollup.course_id == course_id)
+    session.execute(clear)
+    columns = ["course_id", "session_date", "student_id", *STATUS_COLUMNS]
+    result = session.execute(insert(AttendanceDailyRollup).from_select(columns, raw_counts(course_id)))
+    return result.rowcount
+
+
+def find_mismatches(session: Session) -> list:
+    """Rows present on only one side, tagged `raw` or `rollup`; empty when the two agree."""
+    rollup = AttendanceDailyRollup
+    counts = [getattr(rollup, column) for column in STATUS_COLUMNS]
+    # All-zero rows count no records, so they have no raw counterpart and are ignored.
+    stored = select(rollup.course_id, rollup.session_date, rollup.student_id, *counts).where(
+        or_(*(count != 0 for count in counts))
+    )
+    expected = raw_counts()
+    missing = except_(expected, stored).subquery()
+    extra = except_(stored, expected).subquery()
+    rows = [("raw", *row) for row in session.execute(select(missing))]
+    rows += [("rollup", *row) for row in session.execute(select(extra))]
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Maintain the attendance_daily_rollups table")
+    parser.add_argument("command", choices=["backfill", "check"])
+    parser.add_argument("--course-id", type=int, default=None, help="backfill a single course")
+    arguments = parser.parse_args()
+
+    with session_scope() as session:
+        if arguments.command == "backfill":
+            print(f"Wrote {backfill(session, arguments.course_id)} rollup rows.")
+            return 0
+        mismatches = find_mismatches(session)
+    for source, course_id, session_date, student_id, *counts in mismatches:
+        tallies = " ".join(f"{column}={count}" for column, count in zip(STATUS_COLUMNS, counts))
+        print(f"{source}: course={course_id} date={session_date} student={student_id} {tallies}")
+    print("Rollup matches attendance_records." if not mismatches else f"{len(mismatches)} mismatched rows.")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,7 @@ from passlib.context import CryptContext
 
 from database.connection import session_scope
 from database.models import (
+    AttendanceDailyRollup,
     AttendanceRecord,
     AttendanceSession,
     AttendanceStatus,
@@ -16,6 +17,7 @@ from database.models import (
     Student,
     Teacher,
 )
+from database.rollups import backfill
 
 random.seed(42)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -26,6 +28,7 @@ def hash_password(password: str) -> str:
 
 
 def reset_tables(session) -> None:
+    session.execute(AttendanceDailyRollup.__table__.delete())
     session.execute(AttendanceRecord.__table__.delete())
     session.execute(AttendanceSession.__table__.delete())
     session.execute(Enrollment.__table__.delete())
@@ -145,6 +148,7 @@ def create_records(
             )
         )
     session.add_all(records)
+    session.flush()
 
 
 def main() -> None:
@@ -156,6 +160,7 @@ def main() -> None:
         create_enrollments(session, courses, students)
         sessions = create_sessions(session, courses)
         create_records(session, sessions, students)
+        backfill(session)
         print("Seeded database with demo data.")
 
 
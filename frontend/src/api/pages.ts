@@ -0,0 +1,24 @@
+import client from './client';
+
+// List endpoints return one page per request and put the cursor for the next
+// page in the X-Next-Cursor header (axios exposes header names lower-cased).
+export const NEXT_CURSOR_HEADER = 'x-next-cursor';
+
+export async function fetchPage<T = any>(path: string, params: Record<string, any> = {}, cursor?: string | null) {
+  const res = await client.get(path, { params: cursor ? { ...params, cursor } : params });
+  return {
+    items: (res.data || []) as T[],
+    nextCursor: (res.headers[NEXT_CURSOR_HEADER] as string | undefined) || null,
+  };
+}
+
+export async function fetchAllPages<T = any>(path: string, params: Record<string, any> = {}) {
+  const items: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const page = await fetchPage<T>(path, params, cursor);
+    items.push(...page.items);
+    cursor = page.nextCursor;
+  } while (cursor);
+  return items;
+}
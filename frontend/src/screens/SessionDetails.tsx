@@ -13,6 +13,7 @@ import {
 import { useFocusEffect } from '@react-navigation/native';
 import { Check, X, Clock } from 'lucide-react-native';
 import client from '../api/client';
+import { fetchAllPages } from '../api/pages';
 import { API_BASE_URL } from '../config';
 import * as ImagePicker from 'expo-image-picker';
 
@@ -70,10 +71,11 @@ export default function SessionDetails({ route }: any) {
     setLoading(true);
     setError(null);
     try {
-      const res = await client.get(`/attendance/records`, { params: { session_id: sessionId } });
-      console.log('✅ Records received:', res.data);
-      console.log('📊 Records length:', res.data?.length);
-      setRecords(res.data || []);
+      // The counts below need every record, so follow the cursor through all pages.
+      const data = await fetchAllPages('/attendance/records', { session_id: sessionId });
+      console.log('✅ Records received:', data);
+      console.log('📊 Records length:', data.length);
+      setRecords(data);
     } catch (err) {
       console.error('❌ Fetch error:', err);
       setError('Unable to load records. Please pull down to retry.');
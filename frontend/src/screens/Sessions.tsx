@@ -1,8 +1,8 @@
-import React, { useEffect, useState } from 'react';
+import React, { useCallback, useEffect, useState } from 'react';
 import { View, Text, FlatList, StyleSheet, ActivityIndicator, TouchableOpacity } from 'react-native';
 import { useNavigation, useRoute } from '@react-navigation/native';
 import { Calendar, FileText, ChevronRight } from 'lucide-react-native';
-import client from '../api/client';
+import { fetchPage } from '../api/pages';
 
 export default function SessionsScreen() {
   const navigation = useNavigation<any>();
@@ -11,13 +11,16 @@ export default function SessionsScreen() {
 
   const [sessions, setSessions] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     (async () => {
       try {
-        const params = courseId ? { course_id: courseId } : undefined;
-        const res = await client.get('/attendance/sessions', { params });
-        setSessions(res.data || []);
+        // Sessions come newest first; older ones are fetched as the list is scrolled.
+        const page = await fetchPage('/attendance/sessions', courseId ? { course_id: courseId } : {});
+        setSessions(page.items);
+        setNextCursor(page.nextCursor);
       } catch (err) {
         // ignore for now
       } finally {
@@ -26,6 +29,20 @@ export default function SessionsScreen() {
     })();
   }, [courseId]);
 
+  const loadMore = useCallback(async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchPage('/attendance/sessions', courseId ? { course_id: courseId } : {}, nextCursor);
+      setSessions((current) => [...current, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      // ignore for now
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [courseId, nextCursor, loadingMore]);
+
   if (loading) {
     return (
       <View style={styles.loadingContainer}>
@@ -47,7 +64,9 @@ export default function SessionsScreen() {
     <View style={styles.container}>
       <View style={styles.header}>
         <Text style={styles.headerTitle}>Sessions</Text>
-        <Text style={styles.headerSubtitle}>{sessions.length} sessions</Text>
+        <Text style={styles.headerSubtitle}>
+          {sessions.length}{nextCursor ? '+' : ''} sessions
+        </Text>
       </View>
 
       <FlatList
@@ -92,6 +111,9 @@ export default function SessionsScreen() {
         )}
         contentContainerStyle={styles.listContent}
         scrollEnabled={true}
+        onEndReached={loadMore}
+        onEndReachedThreshold={0.5}
+        ListFooterComponent={loadingMore ? <ActivityIndicator color="#2563eb" /> : null}
       />
     </View>
   );